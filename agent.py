@@ -1,13 +1,60 @@
 from action import *
 from formula import *
+from goal_tracker import *
+from precondition_index import *
 
+import contextlib
+import instrument
+import io
 import random
 
+# The model last rebuilt in this worker process, with the bytes it was rebuilt from
+WORKER_MODEL = [None, None]
+
+def score_action(model_type, data, name, goal, actions, available_actions, index, depth=1):
+	# Score one of the available actions in a worker process, on the model serialized in data.
+	# Returns the score, the sizes of the random choices the model made and the printed output.
+	if WORKER_MODEL[0] != data:
+		WORKER_MODEL[:] = [data, model_type.from_bytes(data)]
+	model = WORKER_MODEL[1]
+	agent = Agent(name, goal, [], actions)
+	agent.set_model(model)
+	agent.set_depth(depth)
+	model.rng = Choice_Recorder()
+	output = io.StringIO()
+	with contextlib.redirect_stdout(output):
+		score = agent.eval_action(available_actions[index], available_actions)
+	return score, model.rng.sizes, output.getvalue()
+
+
+class Choice_Recorder():
+	"""
+	Takes the place of the random module for a model in a worker process.
+	It records the size of every random choice, so the choices can be made again
+	with the random module of the main process, in the same order as without workers.
+	"""
+	def __init__(self):
+		self.sizes = []
+
+	def choice(self, seq):
+		self.sizes.append(len(seq))
+		return seq[0]
+
+	def randrange(self, stop):
+		self.sizes.append(stop)
+		return 0
+
+
 class Agent():
 
 	"""
 	The Agent class. This contains all methods the agents use to reason.
 	The agents choose actions to perform that will help them achieve their goal.
+	With an executor, the actions are scored in worker processes, see eval_actions.
+	With a depth above 1, an action is also scored by the sequences of actions that can
+	follow it, see goal_reachable.
+	Which actions are available is kept up to date in a Precondition_Index, and whether
+	the goal is achieved in a Goal_Tracker.
 
 	"""
 
@@ -18,6 +65,11 @@ class Agent():
 		self.actions = action 
 		self.knowledge = []
 		self.set_knowledge(knowledge)
+		self.executor = None
+		self.depth = 1
+		self.table = {}
+		self.index = Precondition_Index(self)
+		self.tracker = Goal_Tracker(self)
 
 	def __str__(self):
 		return "Agent {0} has goal ({1}), which is {2}".format(self.name, self.goal, self.achieved())
@@ -35,6 +87,14 @@ class Agent():
 		# The agent can access the Kripke model, this is added soon after initialisation
 		self.model = model
 
+	def set_executor(self, executor):
+		# The agent scores its actions with this process pool executor, or one after another if it is None
+		self.executor = executor
+
+	def set_depth(self, depth):
+		# The agent looks ahead at most this many actions when it scores an action
+		self.depth = depth
+
 	def simplify_knowledge(self):
 		# Simplify the formulas in the knowledge
 		for info in self.knowledge:
@@ -56,22 +116,22 @@ class Agent():
 		self.goal = goal
 
 	def eval_goal(self):
-		# Evaluate if the goal is true for the agent.
-		return self.model.eval_goal(self.goal, self)
+		# Evaluate if the goal is true for the agent, as the model would: 1 if true, 0 if false, -1 if neither
+		return self.tracker.status(self.model)
 
 	def find_available_actions(self, model, verbose):
 		# Find available actions for the agent and return the list
+		# Only debug output shows every precondition, otherwise the index evaluates the ones an update could change
+		if verbose < 2:
+			return self.index.available_actions(model)
 		available = []
 		states = model.get_agent_states(self)
 		for action in self.actions:
-			count = 0
 			if verbose > 1:
 				print(action['act'].preconditions)
 
-			# If the agent knows the preconditions of the action, it is available
-			for state in states:
-				if Knows(self, action['act'].preconditions).evaluate(model, state): 
-					count += 1
+			# If the agent knows the preconditions of the action in all states, it is available
+			count = model.count_set(model.truth_set(Knows(self.name, action['act'].preconditions)))
 			if verbose > 1:
 				print("\t {0} out of {1} states have value True".format(count, len(states)))
 			if count == len(states):
@@ -79,10 +139,52 @@ class Agent():
 		return available
 
 	def eval_action(self, action, available_actions):
-		# To evaluate an action, test it in a copy of the model
-		copy_model = Kripke_Model.from_kripke(self.model)
-		return copy_model.eval_action(action, self, available_actions)
-
+		# To evaluate an action, test it in the model and roll the changes back afterwards
+		with instrument.measured('hypothetical', agent=self.name, action=action['act'].name):
+			with self.model.hypothetical():
+				return self.model.eval_action(action, self, available_actions, self.depth)
+
+	def goal_reachable(self, depth, table):
+		# Return whether a sequence of at most depth available actions makes the goal true in the model.
+		# Only public announcements are made, so the live states are all that differs between the models
+		# searched: the table keeps for every live set the depth it was searched to, or True if the goal
+		# is reachable from it, so live sets reached by actions in another order are searched once.
+		key = self.model.live_set()
+		known = table.get(key, 0)
+		if known is True or known >= depth:
+			instrument.count('transpositions')
+			return known is True
+		instrument.count('plan_nodes')
+		# The true states chosen in the search change no outcome, so they are not chosen at random,
+		# which keeps the random choices the same with and without workers
+		rng = self.model.rng
+		self.model.rng = Choice_Recorder()
+		try:
+			for action in self.find_available_actions(self.model, 0):
+				with self.model.hypothetical():
+					self.model.public_announcement(action['act'].postconditions)
+					# Stop at the first action that reaches the goal
+					if self.eval_goal() == 1 or (depth > 1 and self.goal_reachable(depth - 1, table)):
+						table[key] = True
+						return True
+		finally:
+			self.model.rng = rng
+		table[key] = depth
+		return False
+
+	def eval_actions(self, available_actions):
+		# Score all available actions in worker processes, each gets the model as bytes
+		data = self.model.to_bytes()
+		futures = [self.executor.submit(score_action, type(self.model), data, self.name, self.goal, self.actions, available_actions, index, self.depth) for index in range(len(available_actions))]
+		scores = {}
+		for (action, future) in zip(available_actions, futures):
+			score, sizes, output = future.result()
+			# Print and choose at random as the evaluation would have done here, in the same order
+			print(output, end='')
+			for size in sizes:
+				random.randrange(size)
+			scores[action['act'].name] = score
+		return scores
 
 	def eval_score(self, scores, available_actions, verbose):
 		# Choose the best action from the scores given
@@ -105,6 +207,8 @@ class Agent():
 		if verbose > 0:
 			print("Choosing actions for agent {0}".format(self.name))
 		self.simplify_knowledge()
+		# The models searched by goal_reachable start from this one
+		self.table = {}
 
 		# Find which actions are possible, if there are none, return None
 		available_actions = self.find_available_actions(self.model, verbose)
@@ -112,9 +216,12 @@ class Agent():
 			return None
 
 		# Score the available actions
-		scores = {}
-		for action in available_actions:
-			scores[action['act'].name] = (self.eval_action(action, available_actions))
+		if self.executor is not None:
+			scores = self.eval_actions(available_actions)
+		else:
+			scores = {}
+			for action in available_actions:
+				scores[action['act'].name] = (self.eval_action(action, available_actions))
 
 		# Return the best of the actions
 		return self.eval_score(scores, available_actions, verbose)
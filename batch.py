@@ -0,0 +1,104 @@
+"""
+Runs an example many times, across seeds and optionally every candidate true world,
+and summarises the actions performed and the goals achieved.
+
+	python batch.py language --runs 100 --worlds --workers 4 --output summary.json
+
+Every process parses and sets up the example once, and starts every run from a copy
+of the model after setup. A run with seed s performs the same actions as running the
+example after random.seed(s).
+"""
+from central_system import *
+from configs import CONFIGS
+
+import argparse
+import collections
+import concurrent.futures
+import json
+import random
+import sys
+
+# The central system of this worker process, set up once by start_worker
+WORKER_SYSTEM = [None]
+
+
+def setup_system(config):
+	# Parse and set up the example once, and keep the model after setup to restart from
+	system = Central_System(dict(config, turns=list(config['turns'])), 0)
+	system.save_setup()
+	return system
+
+def run_sample(system, seed, true_state):
+	# Run the example once from the model after setup, and return what happened
+	random.seed(seed)
+	system.restart(true_state)
+	start = system.model.true_state
+	system.run_example()
+	goals = {name : agent.eval_goal() == 1 for (name, agent) in system.agents.items()}
+	return {'seed' : seed, 'true_state' : start, 'actions' : system.performed_actions, 'goals' : goals}
+
+def start_worker(config):
+	# Set up the example in a worker process
+	WORKER_SYSTEM[0] = setup_system(config)
+
+def run_in_worker(sample):
+	# Run one sample, a seed and a true state or None, in a worker process
+	return run_sample(WORKER_SYSTEM[0], *sample)
+
+def summarise(title, results):
+	# Aggregate the frequencies of the action sequences and the goal achievement rates of the agents
+	sequences = collections.Counter(tuple(tuple(act) for act in result['actions']) for result in results)
+	true_states = collections.Counter(result['true_state'] for result in results)
+	agents = results[0]['goals'] if results else {}
+	return {
+		'title' : title,
+		'runs' : len(results),
+		'sequences' : [{'actions' : [list(act) for act in sequence], 'count' : count, 'frequency' : count / len(results)} for (sequence, count) in sequences.most_common()],
+		'goals' : {agent : sum(result['goals'][agent] for result in results) / len(results) for agent in agents},
+		'true_states' : {str(state) : count for (state, count) in sorted(true_states.items())},
+	}
+
+def run_batch(config, runs, worlds=False, workers=0, first_seed=0):
+	'''
+	Runs the example of the configuration for the seeds first_seed up to first_seed + runs.
+	With worlds, every seed is run from every candidate true world, otherwise the
+	true world is chosen at random as in a single run.
+	With workers, the runs are spread over that many processes.
+	Returns the summary.
+	'''
+	system = None
+	true_states = [None]
+	if worlds or workers == 0:
+		system = setup_system(config)
+	if worlds:
+		true_states = list(system.setup_model.trues)
+	samples = [(seed, state) for seed in range(first_seed, first_seed + runs) for state in true_states]
+
+	if workers == 0:
+		results = [run_sample(system, *sample) for sample in samples]
+	else:
+		with concurrent.futures.ProcessPoolExecutor(workers, initializer=start_worker, initargs=(config,)) as executor:
+			results = list(executor.map(run_in_worker, samples, chunksize=max(1, len(samples) // (4 * workers))))
+	return summarise(config['title'], results)
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description="Run an example many times and summarise the results.")
+	parser.add_argument('title', choices=sorted(CONFIGS), help="the example to run")
+	parser.add_argument('--runs', type=int, default=10, help="the number of seeds to run")
+	parser.add_argument('--first-seed', type=int, default=0, help="the first seed")
+	parser.add_argument('--worlds', action='store_true', help="run every seed from every candidate true world")
+	parser.add_argument('--workers', type=int, default=0, help="the number of worker processes, 0 runs everything here")
+	parser.add_argument('--config', default='{}', help="extra configuration options as JSON, e.g. '{\"relations\": \"matrix\"}'")
+	parser.add_argument('--output', help="the file to write the summary to, instead of printing it")
+	args = parser.parse_args()
+
+	config = dict(CONFIGS[args.title])
+	config.update(json.loads(args.config))
+	summary = run_batch(config, args.runs, args.worlds, args.workers, args.first_seed)
+	if args.output:
+		with open(args.output, 'w') as file:
+			json.dump(summary, file, indent=2)
+	else:
+		json.dump(summary, sys.stdout, indent=2)
+		print()
@@ -0,0 +1,260 @@
+"""
+A small package for reduced ordered binary decision diagrams (BDDs).
+"""
+
+
+class BDD():
+	"""
+	A manager for BDDs over a fixed number of ordered variables.
+	Nodes are integers: 0 is false, 1 is true, and every other node tests one variable
+	and has a low (variable false) and a high (variable true) child. Equal nodes are
+	stored once, so two functions are equal exactly when their nodes are equal.
+	"""
+	def __init__(self, num_vars):
+		# The terminals have a variable below all others
+		self.num_vars = num_vars
+		self.var = [num_vars, num_vars]
+		self.low = [0, 1]
+		self.high = [0, 1]
+		self.unique = {}
+		self.cache = {}
+
+	def make(self, var, low, high):
+		# Return the node testing var with these children
+		if low == high:
+			return low
+		key = (var, low, high)
+		node = self.unique.get(key)
+		if node is None:
+			node = len(self.var)
+			self.var.append(var)
+			self.low.append(low)
+			self.high.append(high)
+			self.unique[key] = node
+		return node
+
+	def variable(self, var):
+		# Return the node that is true when the variable is true
+		return self.make(var, 0, 1)
+
+	def cofactors(self, node, var):
+		# Return the children of the node for this variable, which may not be tested by the node
+		if self.var[node] == var:
+			return self.low[node], self.high[node]
+		return node, node
+
+	def negate(self, u):
+		# Return the negation of a node
+		if u < 2:
+			return 1 - u
+		key = ('not', u)
+		if key not in self.cache:
+			self.cache[key] = self.make(self.var[u], self.negate(self.low[u]), self.negate(self.high[u]))
+		return self.cache[key]
+
+	def conj(self, u, v):
+		# Return the conjunction of two nodes
+		if u == 0 or v == 0:
+			return 0
+		if u == 1 or u == v:
+			return v
+		if v == 1:
+			return u
+		if u > v:
+			u, v = v, u
+		key = ('and', u, v)
+		if key not in self.cache:
+			var = min(self.var[u], self.var[v])
+			u0, u1 = self.cofactors(u, var)
+			v0, v1 = self.cofactors(v, var)
+			self.cache[key] = self.make(var, self.conj(u0, v0), self.conj(u1, v1))
+		return self.cache[key]
+
+	def disj(self, u, v):
+		# Return the disjunction of two nodes
+		if u == 1 or v == 1:
+			return 1
+		if u == 0 or u == v:
+			return v
+		if v == 0:
+			return u
+		if u > v:
+			u, v = v, u
+		key = ('or', u, v)
+		if key not in self.cache:
+			var = min(self.var[u], self.var[v])
+			u0, u1 = self.cofactors(u, var)
+			v0, v1 = self.cofactors(v, var)
+			self.cache[key] = self.make(var, self.disj(u0, v0), self.disj(u1, v1))
+		return self.cache[key]
+
+	def xor(self, u, v):
+		# Return the exclusive or of two nodes
+		if u == v:
+			return 0
+		if u == 0:
+			return v
+		if v == 0:
+			return u
+		if u == 1:
+			return self.negate(v)
+		if v == 1:
+			return self.negate(u)
+		if u > v:
+			u, v = v, u
+		key = ('xor', u, v)
+		if key not in self.cache:
+			var = min(self.var[u], self.var[v])
+			u0, u1 = self.cofactors(u, var)
+			v0, v1 = self.cofactors(v, var)
+			self.cache[key] = self.make(var, self.xor(u0, v0), self.xor(u1, v1))
+		return self.cache[key]
+
+	def and_exists(self, u, v, variables):
+		# Return the conjunction of two nodes with the variables (a frozenset) quantified existentially
+		if u == 0 or v == 0:
+			return 0
+		if u == 1 and v == 1:
+			return 1
+		if u > v:
+			u, v = v, u
+		key = ('and_exists', u, v, variables)
+		if key not in self.cache:
+			var = min(self.var[u], self.var[v])
+			u0, u1 = self.cofactors(u, var)
+			v0, v1 = self.cofactors(v, var)
+			low = self.and_exists(u0, v0, variables)
+			if var in variables:
+				# Either value of the variable will do
+				if low == 1:
+					result = 1
+				else:
+					result = self.disj(low, self.and_exists(u1, v1, variables))
+			else:
+				result = self.make(var, low, self.and_exists(u1, v1, variables))
+			self.cache[key] = result
+		return self.cache[key]
+
+	def shift(self, u, offset):
+		# Return the node with every variable v replaced by v + offset, which must keep the order
+		if u < 2:
+			return u
+		key = ('shift', u, offset)
+		if key not in self.cache:
+			self.cache[key] = self.make(self.var[u] + offset, self.shift(self.low[u], offset), self.shift(self.high[u], offset))
+		return self.cache[key]
+
+	def restrict(self, u, values):
+		# Return the node with the variables in values (a dict from variable to bool) fixed
+		if u < 2:
+			return u
+		var = self.var[u]
+		if var in values:
+			return self.restrict(self.high[u] if values[var] else self.low[u], values)
+		return self.make(var, self.restrict(self.low[u], values), self.restrict(self.high[u], values))
+
+	def count(self, u, variables):
+		# Count the assignments to the variables (a sorted list) that make the node true.
+		# The node may only depend on these variables.
+		index = {var : i for (i, var) in enumerate(variables)}
+		index[self.num_vars] = len(variables)
+		counts = {0 : 0, 1 : 1}
+		def count_from(node):
+			# The number of assignments to the variables from the one of this node onwards
+			if node not in counts:
+				low, high = self.low[node], self.high[node]
+				here = index[self.var[node]]
+				counts[node] = (count_from(low) << (index[self.var[low]] - here - 1)) + (count_from(high) << (index[self.var[high]] - here - 1))
+			return counts[node]
+		return count_from(u) << index[self.var[u]], count_from, index
+
+	def nth(self, u, k, variables):
+		# Return the k-th true assignment in increasing order, as a list of bits for the variables
+		total, count_from, index = self.count(u, variables)
+		assert (0 <= k < total), "There is no assignment {0} of {1}".format(k, total)
+		bits = []
+		for (i, var) in enumerate(variables):
+			low, high = self.cofactors(u, var)
+			low_count = count_from(low) << (index[self.var[low]] - i - 1)
+			if k < low_count:
+				bits.append(0)
+				u = low
+			else:
+				k -= low_count
+				bits.append(1)
+				u = high
+		return bits
+
+	def assignments(self, u, variables, i=0):
+		# Iterate over the true assignments in increasing order, as lists of bits for the variables
+		if u == 0:
+			return
+		if i == len(variables):
+			yield []
+			return
+		low, high = self.cofactors(u, variables[i])
+		for (bit, node) in ((0, low), (1, high)):
+			for rest in self.assignments(node, variables, i + 1):
+				yield [bit] + rest
+
+	def dump(self, roots):
+		# Return the nodes below the roots as a list of (var, low, high), children before parents,
+		# and the roots numbered as in that list after the two terminals
+		numbers = {0 : 0, 1 : 1}
+		nodes = []
+		def number(u):
+			if u not in numbers:
+				low, high = number(self.low[u]), number(self.high[u])
+				nodes.append((self.var[u], low, high))
+				numbers[u] = len(nodes) + 1
+			return numbers[u]
+		return nodes, [number(root) for root in roots]
+
+	def load(self, nodes, roots):
+		# Add nodes from dump to this manager and return the roots as nodes of this manager
+		numbers = [0, 1]
+		for (var, low, high) in nodes:
+			numbers.append(self.make(var, numbers[low], numbers[high]))
+		return [numbers[root] for root in roots]
+
+	def evaluate(self, u, values):
+		# Follow the node for an assignment, values is a function from variable to bool
+		while u > 1:
+			u = self.high[u] if values(self.var[u]) else self.low[u]
+		return u == 1
+
+
+class Function():
+	"""
+	A boolean function stored as a node of a BDD manager.
+	It supports the same operators as the bitmasks used for sets of states.
+	"""
+	__slots__ = ('bdd', 'node')
+
+	def __init__(self, bdd, node):
+		self.bdd = bdd
+		self.node = node
+
+	def __and__(self, other):
+		return Function(self.bdd, self.bdd.conj(self.node, other.node))
+
+	def __or__(self, other):
+		return Function(self.bdd, self.bdd.disj(self.node, other.node))
+
+	def __xor__(self, other):
+		return Function(self.bdd, self.bdd.xor(self.node, other.node))
+
+	def __invert__(self):
+		return Function(self.bdd, self.bdd.negate(self.node))
+
+	def __eq__(self, other):
+		return isinstance(other, Function) and self.node == other.node
+
+	def __hash__(self):
+		return hash(self.node)
+
+	def __bool__(self):
+		return self.node != 0
+
+	def __repr__(self):
+		return "Function({0})".format(self.node)
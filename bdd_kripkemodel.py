@@ -0,0 +1,325 @@
+from kripkemodel import *
+from bdd import *
+import marshal
+import pprint
+import random
+
+
+class BDD_States():
+	"""
+	A read-only view on a set of states stored as a BDD function over the state variables.
+	It behaves like a set of states, but the states are only listed when it is iterated.
+	"""
+	def __init__(self, model, function):
+		self.model = model
+		self.function = function
+
+	def __iter__(self):
+		return self.model.iter_states(self.function)
+
+	def __len__(self):
+		return self.model.count_set(self.function)
+
+	def __contains__(self, state):
+		return self.model.contains(self.function, state)
+
+	def __repr__(self):
+		return repr(set(self))
+
+
+class BDD_Kripke_Model(Kripke_Model):
+	"""
+	The symbolic Kripke Model class. It stores the states and relations as binary decision diagrams,
+	so the states never have to be listed one by one.
+	Every literal has a variable for the state a relation starts in (x) and one for the state it
+	ends in (x'), interleaved in the order of the literals:
+		the live states are a function of x
+		the relation of every agent is a function of x and x', it is only used between live states
+	A state is the same number as in the explicit model: the first literal is the most significant bit.
+	Announcements are conjunctions with these functions, and knowledge is found with a relational product.
+	Nothing in a BDD is ever changed, so copies and transactions only have to keep the old functions.
+	"""
+	def __init__(self, literals, truth, agent_names, verbose, constraints=()):
+		# Set up the functions for the live states and the relations, every state reaches every state
+		# Only the states in which all constraints are true are part of the model
+		self.verbose = verbose
+		self.journal = None
+		self.savepoints = []
+		self.version = next(VERSIONS)
+		self.truths = {}
+		self.rng = random
+		self.lineage = object()
+		self.agent_names = agent_names
+		self.literals = [lit.formula for lit in literals]
+		self.bdd = BDD(2 * len(literals))
+		# The variable of the literal in the current state is 2 * index, in the next state 2 * index + 1
+		self.variables = [2 * index for index in range(len(literals))]
+		self.next_variables = frozenset(var + 1 for var in self.variables)
+		self.live = Function(self.bdd, 1)
+		self.relations = {agent : Function(self.bdd, 1) for agent in agent_names}
+		for constraint in constraints:
+			self.live &= self.truth_set(constraint)
+		self.changed()
+		self.true_state = self.determine_true_state(truth)
+
+	@classmethod
+	def from_kripke(cls, old_model, count=True):
+		# Allows the user to copy the model without overwriting.
+		# The functions are never changed, so the copy can share all of them.
+		# Without count the copy is a snapshot kept aside, not a copy of the model to update, and is not counted.
+		if count:
+			instrument.count('model_copies')
+		model = cls.__new__(cls)
+		model.__dict__.update(old_model.__dict__)
+		model.relations = dict(old_model.relations)
+		model.journal = None
+		model.savepoints = []
+		return model
+
+	def to_bytes(self):
+		# Serialize the model: the literals and the nodes of the live states, the true states and the relations
+		roots = [self.live.node, self.true_set.node] + [self.relations[agent].node for agent in self.agent_names]
+		nodes, roots = self.bdd.dump(roots)
+		return marshal.dumps((self.literals, self.agent_names, self.verbose, nodes, roots, self.true_state))
+
+	@classmethod
+	def from_bytes(cls, data, compact=True, backend='matrix'):
+		# Rebuild a model serialized by to_bytes, in a new BDD manager
+		# The options for the state map and relations of the explicit model do not apply
+		literals, agent_names, verbose, nodes, roots, true_state = marshal.loads(data)
+		model = cls.__new__(cls)
+		model.verbose = verbose
+		model.journal = None
+		model.savepoints = []
+		model.version = next(VERSIONS)
+		model.truths = {}
+		model.rng = random
+		model.lineage = object()
+		model.agent_names = agent_names
+		model.literals = literals
+		model.bdd = BDD(2 * len(literals))
+		model.variables = [2 * index for index in range(len(literals))]
+		model.next_variables = frozenset(var + 1 for var in model.variables)
+		roots = [Function(model.bdd, node) for node in model.bdd.load(nodes, roots)]
+		model.live, model.true_set = roots[0], roots[1]
+		model.relations = {agent : relation for (agent, relation) in zip(agent_names, roots[2:])}
+		model.true_state = true_state
+		return model
+
+	@property
+	def states(self):
+		# The list of all states in the model, only used for printing
+		return list(self.iter_states(self.live))
+
+	@property
+	def trues(self):
+		# The list of all true states, only used for printing
+		return list(self.iter_states(self.true_set))
+
+	def state_of(self, bits):
+		# Return the state for the values of the variables, the first one is the most significant bit
+		state = 0
+		for bit in bits:
+			state = state << 1 | bit
+		return state
+
+	def bit(self, state, var):
+		# Return the value of a current state variable in a state
+		return state >> (len(self.literals) - 1 - var // 2) & 1
+
+	def iter_states(self, function):
+		# Iterate over the states of a function of x, in increasing order
+		for bits in self.bdd.assignments(function.node, self.variables):
+			yield self.state_of(bits)
+
+	def contains(self, function, state):
+		# Check whether a state is in a function of x
+		return state >= 0 and self.bdd.evaluate(function.node, lambda var: self.bit(state, var))
+
+	def choose_state(self, function):
+		# Choose a random state of a function of x, as random.choice would from the list of its states
+		count = self.count_set(function)
+		return self.state_of(self.bdd.nth(function.node, self.rng.randrange(count), self.variables))
+
+	def to_next(self, function):
+		# Return the function of x as the same function of x'
+		return Function(self.bdd, self.bdd.shift(function.node, 1))
+
+	def reachable_set(self, state, agent):
+		# Return the live states that the agent reaches from a state, as a function of x
+		values = {var : bool(self.bit(state, var)) for var in self.variables}
+		successors = self.bdd.restrict(self.relations[agent].node, values)
+		return self.live & Function(self.bdd, self.bdd.shift(successors, -1))
+
+	def print_state_map(self):
+		# Print the values of all states
+		pp = pprint.PrettyPrinter(indent=4)
+		pp.pprint({state : self.valuation(state) for state in self.iter_states(self.live)})
+
+	def print_agent_states(self, agent):
+		# Print all the states for the agent
+		print("Agent {0}".format(agent))
+		pp = pprint.PrettyPrinter(indent=4)
+		pp.pprint({state : set(self.get_reachable_states(state, agent)) for state in self.iter_states(self.live)})
+
+	def determine_true_state(self, truth):
+		# Determine points for the model and chosose one to reason from
+		self.true_set = self.live
+		for expr in truth:
+			self.true_set &= self.truth_set(expr)
+		assert (self.true_set), "There are no true worlds"
+
+		# Like the explicit engine, a single true world is taken without a random choice
+		count = self.count_set(self.true_set)
+		if count == 1:
+			return next(self.iter_states(self.true_set))
+		true = self.choose_state(self.true_set)
+		if self.verbose > 1:
+			print("There is more than one true world: {0}, \nwe chose {1} with values {2}".format(self.trues, true, self.valuation(true)))
+		return true
+
+	def choose_true_state(self):
+		# Choose the true state again among the true states, with the same random choice as determine_true_state
+		if self.count_set(self.true_set) > 1:
+			self.true_state = self.choose_state(self.true_set)
+
+	def set_true_state(self, state):
+		# Reason from this true state from now on
+		assert (self.contains(self.true_set, state)), "State {0} is not one of the true states".format(state)
+		self.true_state = state
+
+	def get_agent_states(self, agent):
+		# Get the states reachable for an agent, every live state has relations
+		return BDD_States(self, self.live)
+
+	def get_reachable_states(self, state, agent):
+		# Return the set of states the agent can reach from current state
+		if state == -1:
+			state = self.true_state
+
+		if isinstance(agent, str):
+			return BDD_States(self, self.reachable_set(state, agent))
+		return BDD_States(self, self.reachable_set(state, agent.name))
+
+	def live_set(self):
+		# Return the set of all states in the model, as a function of x
+		return self.live
+
+	def literal_set(self, literal):
+		# Return the set of states in which the literal is true, as a function of x
+		var = self.variables[self.literals.index(literal.formula)]
+		return self.live & Function(self.bdd, self.bdd.variable(var))
+
+	def knows_set(self, agent, truth):
+		# Return the set of states from which the agent reaches no live state outside truth
+		if not isinstance(agent, str):
+			agent = agent.name
+		outside = self.to_next(self.live & ~truth)
+		reaches_outside = self.bdd.and_exists(self.relations[agent].node, outside.node, self.next_variables)
+		return self.live & ~Function(self.bdd, reaches_outside)
+
+	def truth_subset(self, formula, states):
+		# Return the states among states in which the formula is true, as a function of x
+		return self.truth_set(formula) & states
+
+	def empty_set(self):
+		# Return the empty set of states, as a function of x
+		return Function(self.bdd, 0)
+
+	def count_set(self, states):
+		# Count the states in a set of states
+		return self.bdd.count(states.node, self.variables)[0]
+
+	def holds(self, formula, state):
+		# Evaluate a formula in a single state, by looking the state up in its truth set
+		if instrument.ENABLED:
+			instrument.count('evaluate.' + type(formula).__name__)
+		return self.contains(self.truth_set(formula), state)
+
+	def valuation(self, state):
+		# Return the values of the literals in a state
+		top = len(self.literals) - 1
+		return {lit : bool(state >> (top - index) & 1) for (index, lit) in enumerate(self.literals)}
+
+	def eval_in_state(self, state, literal):
+		# Evaluate a literal in the state mentioned.
+		# If state passed along is -1, that refers to the true state
+		if state == -1:
+			state = self.true_state
+		return self.valuation(state)[literal.formula]
+
+	def remove_state(self, state):
+		# Remove a single state from the model
+		self.restrict_to(self.live & ~self.state_set(state))
+
+	def state_set(self, state):
+		# Return the set containing only this state, as a function of x
+		node = 1
+		for var in reversed(self.variables):
+			node = self.bdd.make(var, 0, node) if self.bit(state, var) else self.bdd.make(var, node, 0)
+		return Function(self.bdd, node)
+
+	def restrict_to(self, keep):
+		# Remove all states not in keep (a function of x) from the model at once
+		if not self.live & ~keep:
+			return
+		instrument.count('restrict_to')
+		self.record(setattr, self, 'live', self.live)
+		self.live &= keep
+		self.restrict_true_states(keep)
+		self.changed()
+
+	def drop_unreachable(self):
+		# Remove the states that no agent reaches from the true states in any number of steps,
+		# the states reached in one more step are found with a relational product for every agent
+		variables = frozenset(self.variables)
+		reached = self.true_set
+		frontier = reached
+		while frontier:
+			image = self.empty_set()
+			for agent in self.agent_names:
+				successors = self.bdd.and_exists(frontier.node, self.relations[agent].node, variables)
+				image |= Function(self.bdd, self.bdd.shift(successors, -1))
+			frontier = self.live & image & ~reached
+			reached |= frontier
+		self.restrict_to(reached)
+
+	def restrict_true_states(self, keep):
+		# Keep only the true states in keep. If the true state is removed, choose a new one.
+		true_set = self.true_set & keep
+		if true_set == self.true_set:
+			return
+		self.record(setattr, self, 'true_set', self.true_set)
+		self.true_set = true_set
+		if not self.contains(keep, self.true_state):
+			assert (self.true_set), "No true worlds left after removal of {0}".format(self.true_state)
+			removal_state = self.true_state
+			self.record(setattr, self, 'true_state', self.true_state)
+			self.true_state = self.choose_state(self.true_set)
+			if self.verbose > 1:
+				print("True state {0} removed, new true state is :".format(removal_state))
+				self.print_true_state()
+
+	def private_announcement(self, message, agent):
+		# Perfom a private announcement
+		# for this agent, remove all connections between states that disagree on value of message
+		truth = self.truth_set(message)
+		relation = self.relations[agent.name]
+		self.record(self.relations.__setitem__, agent.name, relation)
+		self.relations[agent.name] = relation & ~(truth ^ self.to_next(truth))
+		self.relations_changed()
+		self.changed()
+
+	def private_belief_update(self, message, agent):
+		# Update the private beliefs for the agent with this message
+		# by removing the links to all states in which the message is false
+		truth = self.truth_set(message)
+		relation = self.relations[agent.name]
+		if self.verbose > 1:
+			for st in self.iter_states(self.true_set & ~truth):
+				if self.contains(self.reachable_set(st, agent.name), st):
+					print("Removing reflexive relation {0} for message {1} and agent {2}\n State had values {3}".format(st, message, agent.name, self.valuation(st)))
+		self.record(self.relations.__setitem__, agent.name, relation)
+		self.relations[agent.name] = relation & self.to_next(truth)
+		self.relations_changed()
+		self.changed()
@@ -0,0 +1,76 @@
+"""
+Times the phases of running generated scenarios of increasing size.
+
+	python benchmark.py --literals 4 8 12 --agents 2 3 --actions 4 --depth 2 --seeds 3 --output benchmark.json
+
+Every combination of the sizes given is generated with every seed (see scenario.py) and run
+once. The time of every phase (parse, model, beliefs, protocols, turns) and of every turn is
+written to the output file as JSON, together with the number of states of the model.
+"""
+from central_system import *
+from scenario import *
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+
+
+def run_benchmark(literals, agents, actions, protocols, depth, seed, rounds, extra, directory):
+	# Generate one scenario, run it and return its timings
+	generator = Scenario_Generator(literals, agents, actions, protocols, depth, seed)
+	title = 'generated_{0}_{1}_{2}_{3}_{4}_{5}'.format(literals, agents, actions, protocols, depth, seed)
+	path = os.path.join(directory, title + '.txt')
+	with open(path, 'w') as file:
+		file.write(generator.generate())
+	config = generator.config(title, path, rounds)
+	config.update(extra)
+
+	random.seed(seed)
+	start = time.perf_counter()
+	system = Central_System(config, 0)
+	states = system.model.count_set(system.model.live_set())
+	system.run_example()
+	return {
+		'literals' : literals,
+		'agents' : agents,
+		'actions' : actions,
+		'protocols' : protocols,
+		'depth' : depth,
+		'seed' : seed,
+		'states' : states,
+		'total' : time.perf_counter() - start,
+		'phases' : system.phase_times,
+		'turns' : system.turn_times,
+		'performed_actions' : system.performed_actions,
+	}
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description="Time the phases of running generated scenarios.")
+	parser.add_argument('--literals', type=int, nargs='+', default=[4, 6, 8])
+	parser.add_argument('--agents', type=int, nargs='+', default=[2])
+	parser.add_argument('--actions', type=int, nargs='+', default=[4])
+	parser.add_argument('--protocols', type=int, nargs='+', default=[1])
+	parser.add_argument('--depth', type=int, nargs='+', default=[2])
+	parser.add_argument('--seeds', type=int, default=1, help="the number of scenarios of every size")
+	parser.add_argument('--rounds', type=int, default=1)
+	parser.add_argument('--config', default='{}', help="extra configuration options as JSON, e.g. '{\"relations\": \"matrix\"}'")
+	parser.add_argument('--output', default='benchmark.json', help="the file to write the results to")
+	args = parser.parse_args()
+
+	extra = json.loads(args.config)
+	results = []
+	with tempfile.TemporaryDirectory() as directory:
+		for sizes in itertools.product(args.literals, args.agents, args.actions, args.protocols, args.depth):
+			for seed in range(args.seeds):
+				result = run_benchmark(*sizes, seed, args.rounds, extra, directory)
+				print("literals {0} agents {1} actions {2} protocols {3} depth {4} seed {5}: {6} states, {7:.3f}s".format(*(sizes + (seed, result['states'], result['total']))))
+				results.append(result)
+
+	with open(args.output, 'w') as file:
+		json.dump({'python' : platform.python_version(), 'config' : extra, 'rounds' : args.rounds, 'results' : results}, file, indent=2)
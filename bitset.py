@@ -0,0 +1,65 @@
+"""
+Helpers for sets of states stored as bitmasks.
+In a bitmask, bit i is set when state i is in the set.
+When most states are removed, the few that are left can be spread over a long bitmask:
+then iterating takes the highest bit again and again instead of going over all bytes.
+"""
+
+# For every byte value, the positions of the bits that are set
+_BYTE_BITS = [[bit for bit in range(8) if value >> bit & 1] for value in range(256)]
+# Masks with at most this many states are iterated from the highest bit
+SPARSE = 64
+
+
+def iter_bits(mask):
+	# Iterate over the states in the bitmask, in increasing order
+	if count_bits(mask) <= SPARSE:
+		states = []
+		while mask:
+			state = mask.bit_length() - 1
+			states.append(state)
+			mask ^= 1 << state
+		yield from reversed(states)
+		return
+	data = mask.to_bytes((mask.bit_length() + 7) // 8, 'little')
+	for index, value in enumerate(data):
+		if value:
+			offset = index * 8
+			for bit in _BYTE_BITS[value]:
+				yield offset + bit
+
+def count_bits(mask):
+	# Count the states in the bitmask
+	if hasattr(mask, 'bit_count'):
+		return mask.bit_count()
+	return bin(mask).count('1')
+
+def bits_from(states):
+	# Create a bitmask from an iterable of states
+	data = bytearray()
+	for state in states:
+		index = state >> 3
+		if index >= len(data):
+			data.extend(bytes(index - len(data) + 1))
+		data[index] |= 1 << (state & 7)
+	return int.from_bytes(bytes(data), 'little')
+
+
+class Bitset_View():
+	"""
+	A read-only view on a bitmask that behaves like a set of states.
+	"""
+	def __init__(self, mask):
+		self.mask = mask
+
+	def __iter__(self):
+		return iter_bits(self.mask)
+
+	def __len__(self):
+		return count_bits(self.mask)
+
+	def __contains__(self, state):
+		return state >= 0 and bool(self.mask >> state & 1)
+
+	def __repr__(self):
+		return repr(set(self))
@@ -1,10 +1,18 @@
 from action import *
 from agent import *
+from bdd_kripkemodel import *
 from formula import *
 from parser import *
 from protocol import *
+from scenario_cache import *
 from show_kripke import *
 
+import concurrent.futures
+import contextlib
+import instrument
+import pickle
+import time
+
 
 class Central_System():
 	"""
@@ -15,13 +23,27 @@ class Central_System():
 	the agents according to the turntaking method, asking them for actions. After
 	an agents has chosen an action, the cs will update the example and all agents 
 	according to the information contained in the protocols, and turn to the
-	next agent. """
+	next agent. 
+	The time spent in every phase is kept in phase_times, and the time of every
+	turn in turn_times. """
 
 	def __init__(self, config, verbose):
 		"""
 		Initialises the central system
 
-		:param config: contains the title, number of agents and turntaking system
+		:param config: contains the title, number of agents and turntaking system,
+		optionally 'path' to read the example from another file than examples/title.txt,
+		and optionally 'compact' to store the states of the model as bits,
+		'relations' to choose how the relations of the model are stored (by default as bit rows
+		when compact, else as sets),
+		'engine' set to 'bdd' to store the whole model symbolically as BDDs,
+		'workers' to score the actions of agents in that many processes,
+		'lookahead' to let agents look ahead that many actions when they score an action,
+		'minimize' to merge the states that are bisimilar for the literals in the truth, goals, actions
+		and protocols after every update (not with the bdd engine),
+		'drop_unreachable' to remove the states the agents cannot reach from the true states after every update and
+		'cache' to start from the model after setup stored in the scenario cache, if it is there
+		(not in debug mode, which prints the setup)
 		:type config: array with a string, an int and an array
 		:param verbose: contains the verbose level, 0 only prints results, 1 prints run, 
 		2 prints debug comments
@@ -29,8 +51,23 @@ class Central_System():
 		"""
 		self.title = config['title']
 		self.verbose = verbose
-		# Collecting the full input from the input file
-		self.library, truth, actions, self.protocols, agents = parse_input(config['title'])
+		self.phase_times = {}
+		self.turn_times = []
+		path = input_path(config['title'], config.get('path'))
+		cache = config.get('cache', False) and self.verbose < 2
+		cached = None
+		if cache:
+			with self.timed('cache'):
+				cached = load_scenario(path, config)
+		# Collecting the full input from the input file, unless it is cached with the model
+		if cached is None:
+			with self.timed('parse'):
+				parsed = parse_input(config['title'], path)
+			if cache:
+				parsed_data = pickle.dumps(parsed)
+		else:
+			parsed, self.model = cached
+		self.library, self.truth, constraints, actions, self.protocols, agents = parsed
 		self.actions = {action.name : action for action in actions}
 		# Creating the agents
 		self.agent_names = config['agent_names']
@@ -38,19 +75,51 @@ class Central_System():
 		# Setting game mechanics
 		self.setup_turns(config['turns'])
 		self.rounds = config['rounds']
+		self.lookahead = config.get('lookahead', 1)
 		# Setting up Kripke Model
-		self.model = Kripke_Model(self.library, truth, self.agent_names, self.verbose)
+		with self.timed('model'):
+			if cached is not None:
+				# The true state is chosen as the setup would have chosen it
+				self.model.verbose = self.verbose
+				self.model.choose_true_state()
+			elif config.get('engine', 'explicit') == 'bdd':
+				self.model = BDD_Kripke_Model(self.library, self.truth, self.agent_names, self.verbose, constraints)
+			else:
+				self.model = Kripke_Model(self.library, self.truth, self.agent_names, self.verbose, config.get('compact', False), config.get('relations'), constraints)
+		self.drop_unreachable = config.get('drop_unreachable', False)
+		# The literals bisimilar states have to agree on, if they are merged
+		self.minimize_literals = None
+		if config.get('minimize', False):
+			assert (config.get('engine', 'explicit') != 'bdd'), "Bisimilar states are not merged with the bdd engine"
+			self.minimize_literals = self.relevant_literals()
 		# Creating list of performed actions to use later
 		self.performed_actions = []
+		# The process pool to score actions in, if any
+		self.executor = None
+		if config.get('workers', 0) > 0:
+			self.executor = concurrent.futures.ProcessPoolExecutor(config['workers'])
 
 		if self.verbose > 0:
 			print("Setup of {0} example complete.".format(self.title))
 
 		# Initialising beliefs agents
-		self.setup_agent_beliefs()
+		with self.timed('beliefs'), instrument.measured('beliefs'):
+			self.setup_agent_beliefs(cached is None)
+		if cache and cached is None:
+			save_scenario(path, config, parsed_data, self.model)
+		self.reduce_model()
 		if self.verbose > 0:
 			print("Set up agent beliefs.\n")
 
+	@contextlib.contextmanager
+	def timed(self, phase):
+		# Add the time spent in the block to the time of the phase
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.phase_times[phase] = self.phase_times.get(phase, 0) + time.perf_counter() - start
+
 	def setup_turns(self, turns):
 		# Sets the turn order for asking agents for actions
 		self.turns = []
@@ -66,24 +135,76 @@ class Central_System():
 		else:
 			self.turns = turns
 
-	def setup_agent_beliefs(self):
+	def relevant_literals(self):
+		# Return the literals in the truth, the goals of the agents and in the actions and protocols,
+		# after setup nothing else is evaluated, and the true state keeps the values the truth gives it
+		literals = set()
+		for expr in self.truth:
+			literals |= expr.literals()
+		for agent in self.agents.values():
+			literals |= agent.goal.literals()
+		for action in self.actions.values():
+			literals |= action.preconditions.literals() | action.postconditions.literals()
+		for prot in self.protocols:
+			literals |= prot.preconditions.literals() | prot.postconditions.literals()
+		return sorted(literals)
+
+	def reduce_model(self):
+		# Remove the unreachable states and merge the bisimilar states of the model, if the configuration asks for it
+		if self.drop_unreachable:
+			with self.timed('reduce'):
+				self.model.drop_unreachable()
+		if self.minimize_literals is not None:
+			with self.timed('reduce'):
+				self.model.minimize(self.minimize_literals)
+
+	def setup_agent_beliefs(self, update=True):
 		# Set up the agents' initial beliefs
+		# Without update the model already contains them, because it comes from the scenario cache
 		for agent in self.agents.values():
 			# Give the agent access to Kripke Model
 			agent.set_model(self.model)
+			agent.set_executor(self.executor)
+			agent.set_depth(self.lookahead)
 			# Update the agent's belief in the Kripke model
-			for message in agent.knowledge:
-				self.model.private_belief_update(message, agent)
+			if update:
+				for message in agent.knowledge:
+					self.model.private_belief_update(message, agent)
 		if self.verbose > 1:
 			self.print_results()
 
+	def save_setup(self):
+		# Keep a copy of the model after setup, to start new runs from with restart
+		self.setup_model = type(self.model).from_kripke(self.model)
+
+	def restart(self, true_state=None):
+		# Start a new run from the model after setup, without parsing and setting up again.
+		# Without a true state, it is chosen as a new setup would choose it.
+		self.model = type(self.setup_model).from_kripke(self.setup_model)
+		if true_state is None:
+			self.model.choose_true_state()
+		else:
+			self.model.set_true_state(true_state)
+		self.performed_actions = []
+		self.phase_times.pop('protocols', None)
+		self.phase_times.pop('turns', None)
+		self.turn_times = []
+		for agent in self.agents.values():
+			agent.set_model(self.model)
+
+	def shutdown(self, wait=True):
+		# Stop the worker processes the actions are scored in, if any, waiting for them to end if wait
+		if self.executor is not None:
+			self.executor.shutdown(wait=wait)
+
 	def run_example(self):
 		'''
 		runs program by executing protocols, and asking agents for actions
 		'''
 
 		# Check possible protocol updates
-		self.execute_available_protocols()
+		with self.timed('protocols'):
+			self.execute_available_protocols()
 
 		# Until the set number of rounds is completed, ask agents in turn for actions
 		for i in range(self.rounds):
@@ -94,17 +215,22 @@ class Central_System():
 				if self.verbose > 0:
 					print("\n {0}'s turn.\n".format(agent.name))
 
-				# Find the action the agent chooses
-				act = agent.choose_action(self.verbose)
-				if self.verbose > 0:
-					print("{0} chose {1}".format(agent.name, act))
-				#execute the action
-				if not act == None:
-					self.execute_action(agent, self.actions[act])
+				start = time.perf_counter()
+				with self.timed('turns'):
+					# Find the action the agent chooses
+					with instrument.measured('choose_action', agent=agent.name, round=i+1):
+						act = agent.choose_action(self.verbose)
+					if self.verbose > 0:
+						print("{0} chose {1}".format(agent.name, act))
+					#execute the action
+					if not act == None:
+						self.execute_action(agent, self.actions[act])
+				self.turn_times.append({'round' : i+1, 'agent' : agent.name, 'action' : act, 'time' : time.perf_counter() - start})
 				if self.verbose > 1:
 					self.print_results()
 		if self.verbose > 0:
 			print("Run of example {0} is complete.\n".format(self.title))
+		instrument.report(self)
 
 
 	def execute_available_protocols(self):
@@ -113,6 +239,7 @@ class Central_System():
 		for prot in self.protocols:
 			if prot.preconditions.evaluate(self.model, self.model.true_state):
 				self.model.public_announcement(prot.postconditions)
+				self.reduce_model()
 			if self.verbose > 0:
 				print("protocol {0} executed. \n".format(str(prot)))
 
@@ -120,6 +247,7 @@ class Central_System():
 		# Executes the action chosen, and stores it in performed actions list
 		self.performed_actions.append([agent.name, action.name])
 		self.model.public_announcement(action.postconditions)
+		self.reduce_model()
 
 	def eval_results_in_all_true_states(self):
 		# Evaluate results in all possible true states (can be many)
@@ -134,7 +262,7 @@ class Central_System():
 		if state == -1:
 			self.model.print_true_state()
 		else:
-			print("True state: {0}, with values: {1} \n".format(state, self.model.state_map.states[state]))
+			print("True state: {0}, with values: {1} \n".format(state, self.model.valuation(state)))
 
 		# For every agent, show their beliefs on the key literals in the example run
 		for agent in self.agents:
@@ -0,0 +1,7 @@
+# Set configuration inputs for the different examples.
+lang_config = {'title' : "language", 'agent_names': ["Abe", "Britt"], 'turns' : [], 'rounds' : 1}
+soc_config = {'title' : "social", 'agent_names': ["Kate", "Jane", "Anne"], 'turns' : ["Kate", "Jane", "Anne"], 'rounds' : 2}
+# dipl_config = {'title' : "diplomatic", 'agent_names': ["Alice", "Bob"], 'turns' : [], 'rounds' : 1}
+
+# The configurations by title
+CONFIGS = {config['title'] : config for config in [lang_config, soc_config]}
@@ -0,0 +1,36 @@
+"""
+A small DPLL-style generator for the states that satisfy a set of constraints.
+A state is the number of its valuation, the first literal is the most significant bit.
+"""
+
+
+def consistent_states(literals, constraints):
+	# Iterate over the states in which all constraints are true, in increasing order.
+	# The literals are set one at a time, false first, and a branch is cut off as soon as
+	# a constraint is false for the literals set so far.
+	names = [lit.formula for lit in literals]
+	values = {}
+
+	def search(index, state, pending):
+		# Check the constraints that were still undecided, and keep the ones that still are
+		undecided = []
+		for constraint in pending:
+			value = constraint.evaluate_partial(values)
+			if value is False:
+				return
+			if value is None:
+				undecided.append(constraint)
+		remaining = len(names) - index
+		if undecided == []:
+			# Every way to set the remaining literals satisfies the constraints
+			first = state << remaining
+			yield from range(first, first + (1 << remaining))
+			return
+		assert (remaining > 0), "Constraints can only be about literals, not {0}".format(undecided)
+		name = names[index]
+		for value in (False, True):
+			values[name] = value
+			yield from search(index + 1, state << 1 | value, undecided)
+		del values[name]
+
+	return search(0, 0, list(constraints))
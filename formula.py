@@ -2,24 +2,95 @@
 A document containing the classes to represent a formula.
 """
 from kripkemodel import *
-from abc import ABC, abstractmethod as abstract 
+from abc import ABC, ABCMeta, abstractmethod as abstract 
+import itertools
+import weakref
 
-class Formula(ABC):
+# All formulas that exist, by their class and arguments
+FORMULAS = weakref.WeakValueDictionary()
+FORMULA_IDS = itertools.count()
+
+class Interned(ABCMeta):
+	"""
+	The metaclass of all formulas. Creating a formula that is equal to an existing one
+	returns the existing formula, so equal subformulas are a single object with a stable id.
+	"""
+	def __call__(cls, *args):
+		key = (cls,) + args
+		formula = FORMULAS.get(key)
+		if formula is None:
+			formula = super().__call__(*args)
+			formula.id = next(FORMULA_IDS)
+			formula.args = args
+			FORMULAS[key] = formula
+		return formula
+
+class Formula(ABC, metaclass=Interned):
 	"""
 	This abstract class is the base class for all specific types of formula.
 	A formula can be simplified, evaluated, and can return a string version of the formula.
+	It can be evaluated in a single state, or in all states of a model at once. The latter
+	returns the set of states in which the formula is true, in the form the model uses for
+	sets of states (a bitmask, or a BDD function for a symbolic model). The model caches
+	these sets, so subformulas are looked up through model.truth_set.
+	To evaluate in a single state, the simplified formula is compiled once into nested
+	functions, which are cached on the formula.
+	Formulas are interned: equal formulas are the same object, so their compiled functions
+	and cached truth sets are shared wherever they occur.
+	A formula without knowledge can also be evaluated for a partial valuation of the literals,
+	which gives None when the outcome depends on the literals that are not set yet.
 	"""
+	compiled = None
+
 	def __to_str__(self):
 		# Return self in parentheses when not overwritten
 		return '(' + str(self) + ')'
 
+	def __reduce__(self):
+		# Copies and unpickled formulas are created through the class, so they are interned as well
+		return (self.__class__, self.args)
+
 	@abstract
 	def simplify(self):
 		"simplify the formula"
 
 	@abstract
-	def evaluate(self):
-		"evaluate the formula"
+	def build_evaluator(self):
+		"create the function that evaluates the formula in a state"
+
+	def compile(self, model):
+		# Return the function evaluating the simplified formula for the states of this model,
+		# compiled again for another state map (snapshots share its positions and codes)
+		positions = model.state_map.positions
+		if self.compiled is None or self.compiled[0] is not positions:
+			self.compiled = (positions, self.simplify().build_evaluator(model.state_map))
+		return self.compiled[1]
+
+	def evaluate(self, model, state):
+		# Evaluate the formula in a state, if the state is -1 that refers to the true state
+		if state == -1:
+			state = model.true_state
+		return model.holds(self, state)
+
+	@abstract
+	def evaluate_all(self):
+		"evaluate the formula in all states at once"
+
+	@abstract
+	def evaluate_partial(self, values):
+		"evaluate the formula for a partial valuation, None if it is not decided yet"
+
+	def literals(self):
+		# Return the names of the literals that occur in the formula
+		names = set()
+		for arg in self.args:
+			if isinstance(arg, Formula):
+				names |= arg.literals()
+		return names
+
+	def modal_depth(self):
+		# Return how deeply knowledge operators are nested in the formula, 0 if there are none
+		return max([arg.modal_depth() for arg in self.args if isinstance(arg, Formula)], default=0)
 
 class Top(Formula):
 	"""
@@ -34,9 +105,15 @@ class Top(Formula):
 	def simplify(self):
 		return self
 
-	def evaluate(self, model, state):
+	def build_evaluator(self, state_map):
+		return lambda model, state: True
+
+	def evaluate_partial(self, values):
 		return True
 
+	def evaluate_all(self, model):
+		return model.live_set()
+
 class Bot(Formula):
 	"""
 	The Bot is always false.
@@ -50,9 +127,15 @@ class Bot(Formula):
 	def simplify(self):
 		return self
 
-	def evaluate(self, model, state):
+	def build_evaluator(self, state_map):
+		return lambda model, state: False
+
+	def evaluate_partial(self, values):
 		return False
 
+	def evaluate_all(self, model):
+		return model.empty_set()
+
 class Literal(Formula):
 	"""
 	The Literal is the most basic of formulas, the atomic element.
@@ -69,8 +152,22 @@ class Literal(Formula):
 	def simplify(self):
 		return self
 
-	def evaluate(self, model, state):
-		return model.eval_in_state(state, self)
+	def build_evaluator(self, state_map):
+		# The literal is one bit of the valuation of a state, which is its index unless the states have codes
+		position = state_map.positions[self.formula]
+		codes = state_map.codes
+		if codes is None:
+			return lambda model, state: state >> position & 1 == 1
+		return lambda model, state: codes[state] >> position & 1 == 1
+
+	def evaluate_partial(self, values):
+		return values.get(self.formula)
+
+	def literals(self):
+		return {self.formula}
+
+	def evaluate_all(self, model):
+		return model.literal_set(self)
 
 
 class Negation(Formula):
@@ -91,10 +188,18 @@ class Negation(Formula):
 			return self.formula.formula.simplify()
 		return Negation(self.formula.simplify())
 
-	def evaluate(self, model, state):
-		if self.formula.evaluate(model, state):
-			return False
-		return True
+	def build_evaluator(self, state_map):
+		formula = self.formula.build_evaluator(state_map)
+		return lambda model, state: not formula(model, state)
+
+	def evaluate_partial(self, values):
+		value = self.formula.evaluate_partial(values)
+		if value is None:
+			return None
+		return not value
+
+	def evaluate_all(self, model):
+		return model.live_set() & ~model.truth_set(self.formula)
 
 
 class Conjunction(Formula):
@@ -130,12 +235,33 @@ class Conjunction(Formula):
 		return Conjunction(*new_conjuncts)
 
 
-	def evaluate(self, model, state):
-		# If any conjunct is false, the conjunction is False, else True
-		for conj in self.simplify().conjuncts:
-			if not conj.evaluate(model, state):
+	def build_evaluator(self, state_map):
+		conjuncts = [conj.build_evaluator(state_map) for conj in self.conjuncts]
+		def evaluate(model, state):
+			# If any conjunct is false, the conjunction is False, else True
+			for conj in conjuncts:
+				if not conj(model, state):
+					return False
+			return True
+		return evaluate
+
+	def evaluate_partial(self, values):
+		# False if any conjunct is false, undecided if any conjunct is undecided
+		result = True
+		for conj in self.conjuncts:
+			value = conj.evaluate_partial(values)
+			if value is False:
 				return False
-		return True
+			if value is None:
+				result = None
+		return result
+
+	def evaluate_all(self, model):
+		# The conjunction is true in the states in which all conjuncts are true
+		states = model.live_set()
+		for conj in self.conjuncts:
+			states &= model.truth_set(conj)
+		return states
 
 
 class Disjunction(Formula):
@@ -170,12 +296,33 @@ class Disjunction(Formula):
 			return new_disjuncts[0]
 		return Disjunction(*new_disjuncts)
 
-	def evaluate(self, model, state):
-		# If any disjunct is True, the disjunction is True, else False
-		for disj in self.simplify().disjuncts:
-			if disj.evaluate(model, state):
+	def build_evaluator(self, state_map):
+		disjuncts = [disj.build_evaluator(state_map) for disj in self.disjuncts]
+		def evaluate(model, state):
+			# If any disjunct is True, the disjunction is True, else False
+			for disj in disjuncts:
+				if disj(model, state):
+					return True
+			return False
+		return evaluate
+
+	def evaluate_partial(self, values):
+		# True if any disjunct is true, undecided if any disjunct is undecided
+		result = False
+		for disj in self.disjuncts:
+			value = disj.evaluate_partial(values)
+			if value is True:
 				return True
-		return False
+			if value is None:
+				result = None
+		return result
+
+	def evaluate_all(self, model):
+		# The disjunction is true in the states in which any disjunct is true
+		states = model.empty_set()
+		for disj in self.disjuncts:
+			states |= model.truth_set(disj)
+		return states
 
 class Implication(Formula):
 	"""
@@ -194,11 +341,23 @@ class Implication(Formula):
 	def simplify(self):
 		return Implication(self.formula1.simplify(), self.formula2.simplify())
 
-	def evaluate(self, model, state):
+	def build_evaluator(self, state_map):
 		# If the antecendent is not true, or if the consequent is true, the implication is true
-		if (not self.formula1.evaluate(model, state)) or self.formula2.evaluate(model, state):
+		formula1 = self.formula1.build_evaluator(state_map)
+		formula2 = self.formula2.build_evaluator(state_map)
+		return lambda model, state: (not formula1(model, state)) or formula2(model, state)
+
+	def evaluate_partial(self, values):
+		value1 = self.formula1.evaluate_partial(values)
+		value2 = self.formula2.evaluate_partial(values)
+		if value1 is False or value2 is True:
 			return True
-		return False
+		if value1 is True and value2 is False:
+			return False
+		return None
+
+	def evaluate_all(self, model):
+		return (model.live_set() & ~model.truth_set(self.formula1)) | model.truth_set(self.formula2)
 
 class Biimplication(Formula):
 	"""
@@ -217,9 +376,21 @@ class Biimplication(Formula):
 	def simplify(self):
 		return Biimplication(self.formula1.simplify(), self.formula2.simplify())
 
-	def evaluate(self, model, state):
+	def build_evaluator(self, state_map):
 		# If the left side evaluates the same as the right side, it is true
-		return self.formula1.evaluate(model, state) == self.formula2.evaluate(model, state)
+		formula1 = self.formula1.build_evaluator(state_map)
+		formula2 = self.formula2.build_evaluator(state_map)
+		return lambda model, state: formula1(model, state) == formula2(model, state)
+
+	def evaluate_partial(self, values):
+		value1 = self.formula1.evaluate_partial(values)
+		value2 = self.formula2.evaluate_partial(values)
+		if value1 is None or value2 is None:
+			return None
+		return value1 == value2
+
+	def evaluate_all(self, model):
+		return model.live_set() & ~(model.truth_set(self.formula1) ^ model.truth_set(self.formula2))
 
 class Knows(Formula):
 	"""
@@ -238,13 +409,27 @@ class Knows(Formula):
 	def simplify(self):
 		return Knows(self.agent, self.formula.simplify())
 
-	def evaluate(self, model, state):
-		# If in all states reachable, the formula is true, the Knowledge is true
-		states = model.get_reachable_states(state, self.agent)
-		for st in states:
-			if not self.formula.evaluate(model, st):
-				return False
-		return True
+	def build_evaluator(self, state_map):
+		agent = self.agent
+		formula = self.formula.build_evaluator(state_map)
+		def evaluate(model, state):
+			# If in all states reachable, the formula is true, the Knowledge is true
+			for st in model.get_reachable_states(state, agent):
+				if not formula(model, st):
+					return False
+			return True
+		return evaluate
+
+	def evaluate_partial(self, values):
+		# Knowledge depends on the relations, not only on the literals
+		return None
+
+	def modal_depth(self):
+		return 1 + self.formula.modal_depth()
+
+	def evaluate_all(self, model):
+		# The Knowledge is true in the states from which the agent only reaches states where the formula is true
+		return model.knows_set(self.agent, model.truth_set(self.formula))
 
 
 
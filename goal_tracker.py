@@ -0,0 +1,80 @@
+from formula import *
+import instrument
+
+
+class Goal_Tracker():
+	"""
+	Keeps whether the goal of an agent is achieved: true in all states of the model (1), false
+	in all of them (0) or neither (-1), like Kripke_Model.eval_goal.
+	The status is kept for the last version of the model it was asked for, so asking again
+	before the next update costs nothing. The states in which the goal is true are kept for a
+	model, the base. In a model of the same lineage, which only has fewer states, the goal can
+	only have changed in the states from which the agents reached a removed state, in the base,
+	in at most as many steps as knowledge operators are nested in the goal. Only these states
+	are evaluated again, the other states keep the value they had in the base.
+	"""
+
+	def __init__(self, agent):
+		self.agent = agent
+		self.goal = None
+		self.lineage = None
+		self.last = (None, None)
+
+	def rebuild(self, model):
+		# Evaluate the goal in all states of the model, which becomes the base
+		instrument.count('goals_evaluated')
+		self.goal = self.agent.goal
+		self.depth = self.goal.modal_depth()
+		self.base = type(model).from_kripke(model, count=False) if self.depth > 0 else None
+		self.lineage = model.lineage
+		self.live = model.live_set()
+		self.truth = model.truth_set(self.goal)
+
+	def affected(self, removed):
+		# Return the states of the base from which an agent reaches a removed state in at most depth steps
+		live = self.base.live_set()
+		affected = self.base.empty_set()
+		frontier = removed
+		for step in range(self.depth):
+			reaching = self.base.empty_set()
+			for agent in self.base.agent_names:
+				reaching |= live & ~self.base.knows_set(agent, live & ~frontier)
+			frontier = reaching & ~affected
+			affected |= reaching
+		return affected
+
+	def truth_set(self, model):
+		# Return the states of the model in which the goal is true
+		live = model.live_set()
+		if self.goal is not self.agent.goal or self.lineage is not model.lineage or live & ~self.live:
+			self.rebuild(model)
+			return self.truth
+		removed = self.live & ~live
+		if not removed:
+			return self.truth
+		truth = self.truth & live
+		if self.depth > 0:
+			instrument.count('goals_updated')
+			affected = self.affected(removed) & live
+			truth = (truth & ~affected) | model.truth_subset(self.goal, affected)
+		# Outside a transaction the model is not rolled back, so it is the base from now on
+		if model.journal is None and self.depth > 0:
+			self.base = type(model).from_kripke(model, count=False)
+		if model.journal is None:
+			self.live = live
+			self.truth = truth
+		return truth
+
+	def status(self, model):
+		# Return 1 if the goal is true in all states of the model, 0 if it is false in all of them, else -1
+		if self.last[0] == model.version and self.goal is self.agent.goal:
+			return self.last[1]
+		trues = model.count_set(self.truth_set(model))
+		if trues == model.count_set(model.live_set()):
+			status = 1
+		elif trues == 0:
+			status = 0
+		else:
+			status = -1
+		self.last = (model.version, status)
+		return status
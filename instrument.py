@@ -0,0 +1,125 @@
+"""
+Counters for the hot paths of the implementation, switched on with an environment variable:
+
+	HIDDEN_PROTOCOLS_INSTRUMENT=1 python main.py                 prints a report to stderr
+	HIDDEN_PROTOCOLS_INSTRUMENT=report.jsonl python main.py      appends a report to the file
+
+At the end of every run_example a report is made in JSON, with the counters and the
+times of the phases and turns of the central system, after which the counters start again.
+When instrumentation is off, counting only checks instrument.ENABLED.
+A formula evaluated in a single state is counted once as evaluate.<type of the formula>
+when the model is asked whether it holds, whoever asks; the subformulas the compiled
+function of the formula goes through are not counted. The truth sets the model computes
+are counted as evaluate_all.<type of the formula>.
+
+Memory profiling is switched on in the same way with HIDDEN_PROTOCOLS_MEMORY. It traces
+allocations with tracemalloc, which slows everything down, and adds to the report the peak
+and retained bytes of the construction of the state map and the relations, the belief
+setup, every choose_action, every hypothetical evaluation and every model copy.
+"""
+import collections
+import contextlib
+import json
+import os
+import sys
+import tracemalloc
+
+OUTPUT = os.environ.get('HIDDEN_PROTOCOLS_INSTRUMENT', '')
+ENABLED = OUTPUT != ''
+COUNTERS = collections.Counter()
+
+MEMORY_OUTPUT = os.environ.get('HIDDEN_PROTOCOLS_MEMORY', '')
+MEMORY = MEMORY_OUTPUT != ''
+# The measurements of the phases that ended, and the phases that are running, innermost last
+MEASUREMENTS = []
+RUNNING = []
+NOT_MEASURED = contextlib.nullcontext()
+
+if MEMORY:
+	tracemalloc.start()
+
+
+def count(name, amount=1):
+	# Add to a counter
+	if ENABLED:
+		COUNTERS[name] += amount
+
+def copied(obj):
+	# Count a shallow copy of a dictionary or set, and return it
+	if ENABLED:
+		COUNTERS['copied_objects'] += 1
+		COUNTERS['bytes_copied'] += sys.getsizeof(obj)
+	return obj
+
+def measured(phase, **labels):
+	# Return a context in which the memory of the phase is measured: with instrument.measured('beliefs'): ...
+	if not MEMORY:
+		return NOT_MEASURED
+	return Memory_Phase(phase, labels)
+
+
+class Memory_Phase():
+	"""
+	Measures the memory used in a phase with tracemalloc: the peak above the memory in use
+	at the start, and the memory still in use at the end (retained).
+	The peak of tracemalloc is reset at the start of every phase, so the phases that are
+	running around it keep the highest peak they saw so far.
+	"""
+	def __init__(self, phase, labels):
+		self.phase = phase
+		self.labels = labels
+
+	def __enter__(self):
+		current, peak = tracemalloc.get_traced_memory()
+		for running in RUNNING:
+			running.peak = max(running.peak, peak)
+		tracemalloc.reset_peak()
+		self.start = current
+		self.peak = current
+		RUNNING.append(self)
+		return self
+
+	def __exit__(self, *exc_info):
+		current, peak = tracemalloc.get_traced_memory()
+		RUNNING.pop()
+		self.peak = max(self.peak, peak)
+		for running in RUNNING:
+			running.peak = max(running.peak, self.peak)
+		measurement = {'phase' : self.phase, 'peak' : self.peak - self.start, 'retained' : current - self.start}
+		measurement.update(self.labels)
+		MEASUREMENTS.append(measurement)
+		return False
+
+
+def memory_summary():
+	# Summarise the measurements per phase: how often it ran, its highest peak and the bytes it retained in total
+	summary = {}
+	for measurement in MEASUREMENTS:
+		phase = summary.setdefault(measurement['phase'], {'count' : 0, 'peak' : 0, 'retained' : 0})
+		phase['count'] += 1
+		phase['peak'] = max(phase['peak'], measurement['peak'])
+		phase['retained'] += measurement['retained']
+	return summary
+
+def report(system):
+	# Write the report of a run of the central system, and start counting again
+	if not (ENABLED or MEMORY):
+		return
+	data = {
+		'title' : system.title,
+		'phases' : system.phase_times,
+		'turns' : system.turn_times,
+	}
+	if ENABLED:
+		data['counters'] = dict(sorted(COUNTERS.items()))
+		COUNTERS.clear()
+	if MEMORY:
+		data['memory'] = memory_summary()
+		data['memory_phases'] = list(MEASUREMENTS)
+		MEASUREMENTS.clear()
+	output = OUTPUT or MEMORY_OUTPUT
+	if output == '1':
+		print(json.dumps(data), file=sys.stderr)
+	else:
+		with open(output, 'a') as file:
+			file.write(json.dumps(data) + '\n')
@@ -1,42 +1,183 @@
 from formula import *
 from state_map import *
 from relations import *
-import copy	
+from partition_relations import *
+from matrix_relations import *
+from bitset import *
+import contextlib
+import instrument
+import itertools
+import marshal
 import random
 
+# The ways to store the relations of a Kripke model
+RELATIONS = {'dict' : Relations, 'partition' : Partition_Relations, 'matrix' : Matrix_Relations}
+
+# Every version of every model gets a different number
+VERSIONS = itertools.count()
+
+
 class Kripke_Model():
 	"""
 	The Kripke Model class. It stores the states and relations
 	It can be update to reflect the current information
+	Updates can be made inside a transaction, which records how to undo every change
+	in the journal so they can be rolled back without copying the model.
+	Every update gives the model a new version. The truth sets of formulas are cached
+	for the current version only.
+	Random choices of the true state are made with self.rng, which is the random module
+	unless something else has to see the choices.
+	A model can be serialized to bytes with only bitmasks: see to_bytes and from_bytes.
+	Models with the same lineage differ only by the states removed from one of them, a private
+	update or a merge of states starts a new lineage.
 	"""
-	def __init__(self, literals, truth, agent_names, verbose):
+	def __init__(self, literals, truth, agent_names, verbose, compact=False, backend=None, constraints=()):
 		# Set up the relations matrix and the State map
+		# In compact mode the state map stores every state as a bit instead of a dict,
+		# and the states of the model are a view on the live states instead of a list
+		# The backend chooses how the relations are stored, see RELATIONS,
+		# without one compact models store them as bit rows and other models as sets
+		# Only the states in which all constraints are true are part of the model
 		self.verbose = verbose
-		self.state_map = State_Map(literals) #list of dicts with lits and values
+		self.journal = None
+		self.savepoints = []
+		self.version = next(VERSIONS)
+		self.truths = {}
+		self.rng = random
+		self.lineage = object()
+		with instrument.measured('state_map'):
+			self.state_map = State_Map(literals, compact, constraints) #list of dicts with lits and values
 		self.agent_names = agent_names
-		self.states = list(range(len(self.state_map.states)))
-		self.relations = Relations(self, agent_names)
+		self.states = self.state_range(self.state_map.live_states())
+		if backend is None:
+			backend = 'matrix' if compact else 'dict'
+		assert (backend in RELATIONS), "Unknown relations backend {0}".format(backend)
+		with instrument.measured('relations'):
+			self.relations = RELATIONS[backend](self, agent_names)
 		self.true_state = self.determine_true_state(truth)
 
 	@classmethod
-	def from_kripke(cls, old_model):
+	def from_kripke(cls, old_model, count=True):
 		# Allows the user to copy the model without overwriting.
-		model = cls.__new__(cls)
-		model.verbose = old_model.verbose
-		model.state_map = copy.deepcopy(old_model.state_map)
-		model.agent_names = old_model.agent_names
+		# The copy shares the state map and relations until one of the models changes them.
+		# The lists of states and true states are never changed in place, so they are shared as well.
+		# Without count the copy is a snapshot kept aside, not a copy of the model to update, and is not counted.
+		if count:
+			instrument.count('model_copies')
+		with instrument.measured('model_copy') if count else instrument.NOT_MEASURED:
+			model = cls.__new__(cls)
+			model.verbose = old_model.verbose
+			model.state_map = old_model.state_map.snapshot()
+			model.agent_names = old_model.agent_names
+
+			model.states = old_model.states
+			model.relations = old_model.relations.snapshot(model)
+			model.trues = old_model.trues
+			model.true_state = old_model.true_state
+			model.verbose = old_model.verbose
+			model.journal = None
+			model.savepoints = []
+			model.version = old_model.version
+			model.truths = old_model.truths
+			model.rng = old_model.rng
+			model.lineage = old_model.lineage
 
-		model.states = copy.deepcopy(old_model.states)
-		model.relations = copy.deepcopy(old_model.relations)
-		model.trues = old_model.trues
-		model.true_state = old_model.true_state
-		model.verbose = old_model.verbose
+			return model
 
+	def to_bytes(self):
+		# Serialize the model: the literals, the valuations of the states if they have codes, the live
+		# and true states as bitmasks, and for every agent the states reachable from each state as a bitmask
+		rows = {agent : [(state, bits_from(self.get_reachable_states(state, agent))) for state in self.states] for agent in self.agent_names}
+		return marshal.dumps((list(self.state_map.positions), self.state_map.codes, self.agent_names, self.verbose, self.live_set(), bits_from(self.trues), self.true_state, rows))
+
+	@classmethod
+	def from_bytes(cls, data, compact=True, backend=None):
+		# Rebuild a model serialized by to_bytes, with the state map and relations backend given
+		# The formula module imports this one, so its names are looked up when they are needed
+		from formula import Literal
+		literals, codes, agent_names, verbose, live, trues, true_state, rows = marshal.loads(data)
+		model = cls.__new__(cls)
+		model.verbose = verbose
+		model.journal = None
+		model.savepoints = []
+		model.version = next(VERSIONS)
+		model.truths = {}
+		model.rng = random
+		model.lineage = object()
+		model.state_map = State_Map([Literal(lit) for lit in literals], compact, live=live, codes=codes)
+		model.agent_names = agent_names
+		model.states = model.state_range(live)
+		if backend is None:
+			backend = 'matrix' if compact else 'dict'
+		model.relations = RELATIONS[backend].from_rows(model, agent_names, {agent : dict(rows[agent]) for agent in agent_names})
+		model.trues = list(iter_bits(trues))
+		model.true_state = true_state
 		return model
 
+	def begin(self):
+		# Start a transaction, transactions can be nested
+		if self.journal is None:
+			self.journal = []
+		self.savepoints.append(len(self.journal))
+
+	def commit(self):
+		# Keep the changes made since the transaction started
+		self.savepoints.pop()
+		if self.savepoints == []:
+			self.journal = None
+
+	def rollback(self):
+		# Undo the changes made since the transaction started, the most recent change first
+		savepoint = self.savepoints.pop()
+		journal = self.journal
+		self.journal = None
+		while len(journal) > savepoint:
+			undo, args = journal.pop()
+			undo(*args)
+		if self.savepoints != []:
+			self.journal = journal
+
+	@contextlib.contextmanager
+	def hypothetical(self):
+		# Make changes that are rolled back afterwards: with model.hypothetical(): ...
+		self.begin()
+		try:
+			yield self
+		finally:
+			self.rollback()
+
+	def record(self, undo, *args):
+		# Record how to undo a change if a transaction is running
+		if self.journal is not None:
+			self.journal.append((undo, args))
+
+	def changed(self):
+		# Give the changed model a new version, the cached truth sets belong to the old one
+		self.record(self.restore_version, self.version, self.truths)
+		self.version = next(VERSIONS)
+		self.truths = {}
+
+	def relations_changed(self):
+		# The relations changed in another way than by removing states, so the model starts a new lineage
+		self.record(setattr, self, 'lineage', self.lineage)
+		self.lineage = object()
+
+	def restore_version(self, version, truths):
+		# Return to an earlier version, together with its cached truth sets
+		self.version = version
+		self.truths = truths
+
+	def truth_set(self, formula):
+		# Return the states in which the formula is true, cached for the current version
+		if formula not in self.truths:
+			if instrument.ENABLED:
+				instrument.count('evaluate_all.' + type(formula).__name__)
+			self.truths[formula] = formula.evaluate_all(self)
+		return self.truths[formula]
+
 	def print_true_state(self):
 		# Print the point from which evaluation happens currently
-		print("True state: {0}, with values: {1}".format(self.true_state, self.state_map.states[self.true_state]))
+		print("True state: {0}, with values: {1}".format(self.true_state, self.valuation(self.true_state)))
 
 	def print_state_map(self):
 		# Print the entire state map
@@ -57,10 +198,7 @@ class Kripke_Model():
 		# Determine points for the model and chosose one to reason from
 		self.trues = []
 		for expr in truth:
-			expr_truth = []
-			for state in self.states:
-				if expr.evaluate(self, state):
-					expr_truth.append(state)
+			expr_truth = Bitset_View(self.truth_set(expr))
 			# list true worlds
 			if self.trues == []:
 				self.trues.extend(expr_truth)
@@ -70,18 +208,30 @@ class Kripke_Model():
 		if len(self.trues) == 1:
 			return self.trues[0]
 		else:
-			true = random.choice(self.trues)
+			true = self.rng.choice(self.trues)
 			if self.verbose > 1:
-				print("There is more than one true world: {0}, \nwe chose {1} with values {2}".format(self.trues, true, self.state_map.states[true]))
+				print("There is more than one true world: {0}, \nwe chose {1} with values {2}".format(self.trues, true, self.valuation(true)))
 			return true
 
+	def choose_true_state(self):
+		# Choose the true state again among the true states, with the same random choice as determine_true_state
+		if len(self.trues) > 1:
+			self.true_state = self.rng.choice(self.trues)
+
+	def set_true_state(self, state):
+		# Reason from this true state from now on
+		assert (state in self.trues), "State {0} is not one of the true states".format(state)
+		self.true_state = state
+
 	def check_true_state(self, removal_state):
 		# check if true state has been removed. If it has, choose a new one.
 		if removal_state in self.trues:
-			self.trues.remove(removal_state)
+			self.record(setattr, self, 'trues', self.trues)
+			self.trues = [st for st in self.trues if st != removal_state]
 			if removal_state == self.true_state:
+				self.record(setattr, self, 'true_state', self.true_state)
 				assert (len(self.trues) > 0), "No true worlds left after removal of {0}".format(removal_state)
-				self.true_state = random.choice(self.trues)
+				self.true_state = self.rng.choice(self.trues)
 				if self.verbose > 1:
 					print("True state {0} removed, new true state is :".format(removal_state))
 					self.print_true_state()
@@ -89,7 +239,9 @@ class Kripke_Model():
 
 	def get_agent_states(self, agent):
 		# Get the states reachable for an agent
-		return self.relations.get_agent_states(agent.name)		
+		if isinstance(agent, str):
+			return self.relations.get_agent_states(agent)
+		return self.relations.get_agent_states(agent.name)
 
 	def get_reachable_states(self, state, agent):
 		# Return the set of states the agent can reach from current state
@@ -100,6 +252,51 @@ class Kripke_Model():
 			return self.relations.get_reachable_states(state, agent)
 		return self.relations.get_reachable_states(state, agent.name)
 
+	def state_range(self, live):
+		# Return the states in a bitmask: a view on it in compact mode, else a list
+		if self.state_map.compact:
+			return Bitset_View(live)
+		return list(iter_bits(live))
+
+	def live_set(self):
+		# Return the set of all states in the model, as a bitmask
+		return self.state_map.live_states()
+
+	def literal_set(self, literal):
+		# Return the set of states in which the literal is true, as a bitmask
+		return self.state_map.literal_states(literal)
+
+	def knows_set(self, agent, truth):
+		# Return the set of states in which the agent knows that the states in truth hold
+		if isinstance(agent, str):
+			return self.relations.knows_set(agent, truth)
+		return self.relations.knows_set(agent.name, truth)
+
+	def truth_subset(self, formula, states):
+		# Return the states among states (a bitmask) in which the formula is true.
+		# Unless its truth set is known already, a few states are evaluated one by one.
+		if formula in self.truths or count_bits(states) * 8 > count_bits(self.live_set()):
+			return self.truth_set(formula) & states
+		return bits_from(state for state in iter_bits(states) if self.holds(formula, state))
+
+	def empty_set(self):
+		# Return the empty set of states, as a bitmask
+		return 0
+
+	def count_set(self, states):
+		# Count the states in a set of states
+		return count_bits(states)
+
+	def holds(self, formula, state):
+		# Evaluate a formula in a single state, with the compiled function of the formula
+		if instrument.ENABLED:
+			instrument.count('evaluate.' + type(formula).__name__)
+		return formula.compile(self)(self, state)
+
+	def valuation(self, state):
+		# Return the values of the literals in a state
+		return self.state_map.states[state]
+
 	def eval(self, literal):
 		# Evaluate a literal in the true state
 		return self.eval_in_state(self.true_state, literal)
@@ -111,21 +308,24 @@ class Kripke_Model():
 			return self.state_map.eval_in_state(self.true_state, literal)
 		return self.state_map.eval_in_state(state, literal)
 
-	def eval_action(self, action, agent, available_actions):
+	def eval_action(self, action, agent, available_actions, depth=1):
 		""" Evaluate the worth of this action for goal
 		If postconditions enable goal: score = 3
+		If at most depth - 1 further actions enable goal: score = 2
 		If postconditions have pre for new action: score = 1
 		If neither of these: score = 0
-		Optional to add later: if new action would enable goal: score = 2
 		"""
 
-		# Execute the action in the model (happens only in a copy)
+		# Execute the action in the model (happens only in a copy or a transaction that is rolled back)
 		post = action['act'].postconditions
 		self.public_announcement(post)
 
 		# Check if goal is true
 		if agent.eval_goal() == True:
 			return 3
+		# Check if the goal can be reached with more actions
+		if depth > 1 and agent.goal_reachable(depth - 1, agent.table):
+			return 2
 		# Check if new actions are possible
 		else:
 			if self.verbose > 0:
@@ -146,15 +346,10 @@ class Kripke_Model():
 		if all are false, return false
 		if a mix, return -1
 		"""
-		trues = 0
-		falses = 0
 		reach = self.get_agent_states(agent)
-		# For all possible states for the agent evaluate goal
-		for state in reach:
-			if goal.evaluate(self, state):
-				trues += 1
-			else:
-				falses += 1
+		# Evaluate goal in all states at once, every state in the model is possible for the agent
+		trues = self.count_set(self.truth_set(goal))
+		falses = len(reach) - trues
 		# If all states evaluate the goal as true: return 1
 		if trues == len(reach):
 			return 1
@@ -165,29 +360,124 @@ class Kripke_Model():
 
 	def remove_state(self, state):
 		# Remove a state from the model, including from the relations and the statemap
+		instrument.count('remove_state')
 		self.relations.remove_state(state)
-		self.state_map.remove_state(state)
-		self.states.remove(state)
+		self.record(self.state_map.restore_state, state, self.state_map.remove_state(state))
+		self.record(setattr, self, 'states', self.states)
+		self.states = self.state_range(self.live_set())
+		self.changed()
+
+	def restrict_to(self, keep):
+		# Remove all states not in keep (a bitmask) from the relations, the statemap and the true states at once
+		removed = self.live_set() & ~keep
+		if removed == 0:
+			return
+		if instrument.ENABLED:
+			instrument.count('restrict_to')
+			instrument.count('states_removed', count_bits(removed))
+		self.relations.restrict_to(keep, removed)
+		self.record(self.state_map.restore_states, removed, self.state_map.restrict_to(keep))
+		self.record(setattr, self, 'states', self.states)
+		self.states = self.state_range(self.live_set())
+		self.restrict_true_states(keep)
+		self.changed()
+
+	def restrict_true_states(self, keep):
+		# Keep only the true states in keep. If the true state is removed, choose a new one.
+		trues = [st for st in self.trues if keep >> st & 1]
+		if len(trues) == len(self.trues):
+			return
+		self.record(setattr, self, 'trues', self.trues)
+		self.trues = trues
+		if not keep >> self.true_state & 1:
+			assert (len(self.trues) > 0), "No true worlds left after removal of {0}".format(self.true_state)
+			removal_state = self.true_state
+			self.record(setattr, self, 'true_state', self.true_state)
+			self.true_state = self.rng.choice(self.trues)
+			if self.verbose > 1:
+				print("True state {0} removed, new true state is :".format(removal_state))
+				self.print_true_state()
+
+	def drop_unreachable(self):
+		# Remove the states that no agent reaches from the true states in any number of steps,
+		# these do not change the value of any formula in the true states
+		reached = bits_from(self.trues)
+		frontier = reached
+		while frontier:
+			image = 0
+			for state in iter_bits(frontier):
+				for agent in self.agent_names:
+					image |= bits_from(self.get_reachable_states(state, agent))
+			frontier = image & ~reached
+			reached |= frontier
+		if instrument.ENABLED:
+			instrument.count('states_unreachable', count_bits(self.live_set() & ~reached))
+		self.restrict_to(reached)
+
+	def minimize(self, literals=None):
+		# Collapse every class of bisimilar states into one of its states, which keeps the value of
+		# every formula over the literals given (all literals if None) in the states that are left.
+		# States are bisimilar when they agree on the literals and every agent reaches bisimilar
+		# states from them. The classes are refined from the valuations of the literals until they
+		# no longer split.
+		positions = self.state_map.positions
+		if literals is None:
+			literals = list(positions)
+		mask = bits_from(positions[lit] for lit in literals)
+		blocks = {state : self.state_map.code(state) & mask for state in self.states}
+		count = len(set(blocks.values()))
+		while True:
+			signatures = {state : (blocks[state],) + tuple(frozenset(blocks[st] for st in self.get_reachable_states(state, agent)) for agent in self.agent_names) for state in self.states}
+			block_ids = {}
+			blocks = {state : block_ids.setdefault(signature, len(block_ids)) for (state, signature) in signatures.items()}
+			if len(block_ids) == count:
+				break
+			count = len(block_ids)
+		if count == len(self.states):
+			return
+		if instrument.ENABLED:
+			instrument.count('minimize')
+			instrument.count('states_merged', len(self.states) - count)
+
+		# The states of a class are replaced by one of them, which reaches the classes the class reaches.
+		# That is the true state or else a true state in their classes, so they keep their valuations,
+		# and the lowest state in the other classes.
+		trues = set(self.trues)
+		representatives = {}
+		for state in sorted(self.states, key=lambda state: (state != self.true_state, state not in trues, state)):
+			representatives.setdefault(blocks[state], state)
+		rep = {state : representatives[blocks[state]] for state in self.states}
+		rows = {agent : {state : bits_from(rep[st] for st in self.get_reachable_states(state, agent)) for state in representatives.values()} for agent in self.agent_names}
+		self.record(setattr, self, 'trues', self.trues)
+		self.record(setattr, self, 'true_state', self.true_state)
+		self.trues = sorted(set(rep[st] for st in self.trues))
+		self.true_state = rep[self.true_state]
+		self.restrict_to(bits_from(representatives.values()))
+		self.record(setattr, self, 'relations', self.relations)
+		self.relations = type(self.relations).from_rows(self, self.agent_names, rows)
+		self.relations_changed()
+		self.changed()
+		if self.verbose > 1:
+			print("Merged bisimilar states, {0} states are left".format(count))
 
 	def public_announcement(self, message): 
 		# Perform a public announcement
 		
 		# Remove states in which the message is not true
-		remove = []
-		for state in self.states:
-			if not message.evaluate(self, state):
-				remove.append(state)
-		for state in remove:
-			self.remove_state(state)
+		self.restrict_to(self.truth_set(message))
 
 	def private_announcement(self, message, agent):
 		# Perfom a private announcement
 		# for this agent, remove all connections between states that disagree on value of message
 		self.relations.private_announcement(message, agent.name)
+		self.relations_changed()
+		self.changed()
 
 	def private_belief_update(self, message, agent):
 		# Update the private beliefs for the agent with this message
 		self.relations.private_belief_update(message, agent.name)
+		self.relations_changed()
+		self.changed()
 
 
 
@@ -1,11 +1,7 @@
 from central_system import Central_System
+from configs import lang_config, soc_config
 import sys
 
-# Set configuration inputs for the different examples.
-lang_config = {'title' : "language", 'agent_names': ["Abe", "Britt"], 'turns' : [], 'rounds' : 1}
-soc_config = {'title' : "social", 'agent_names': ["Kate", "Jane", "Anne"], 'turns' : ["Kate", "Jane", "Anne"], 'rounds' : 2}
-# dipl_config = {'title' : "diplomatic", 'agent_names': ["Alice", "Bob"], 'turns' : [], 'rounds' : 1}
-
 
 #Prompt the user for input
 example = int(input("\nThis is the implementation for reasoning in hidden protocol situations. \nPlease enter the examples you wish to see.\nPlease enter 1 for the Language example, 2 for the Social example, or 3 for both.\n"))
@@ -0,0 +1,132 @@
+from relations import *
+from bitset import *
+import copy
+import instrument
+import pprint
+
+
+class Matrix_Relations(Relations):
+
+	"""
+	The class for the relations in the Kripke model, stored as a bit matrix.
+	The relations:
+		for all agents a dictionary from a state to a bitmask (a row of the matrix)
+		each state with its bit set in the row is not distinguishable from this one
+	Removed states are masked out of the columns when rows are read, so removing a
+	state or a single relation only clears bits.
+	The rows of the agents in self.shared are shared with a snapshot.
+	"""
+	def __init__(self, model, agent_names):
+		# Set up the relations for the model, every state reaches every state
+		self.model = model
+		self.live = bits_from(self.model.states)
+		self.rows = {}
+		self.shared = set()
+		for agent in agent_names:
+			self.rows[agent] = {state : self.live for state in self.model.states}
+
+	@classmethod
+	def from_rows(cls, model, agent_names, rows):
+		# Create the relations from the states reachable from every state as bitmasks, for every agent
+		relations = cls.__new__(cls)
+		relations.model = model
+		relations.live = bits_from(model.states)
+		relations.shared = set()
+		relations.rows = {agent : dict(rows[agent]) for agent in agent_names}
+		return relations
+
+	def snapshot(self, model):
+		# Return a copy of the relations for another model, sharing the rows until they are changed
+		relations = copy.copy(self)
+		relations.model = model
+		relations.rows = dict(self.rows)
+		self.shared = set(self.rows)
+		relations.shared = set(self.rows)
+		return relations
+
+	def writable_rows(self, agent):
+		# Return the rows of the agent to change them, copying them first if they are shared
+		if agent in self.shared:
+			self.rows[agent] = instrument.copied(dict(self.rows[agent]))
+			self.shared.remove(agent)
+		return self.rows[agent]
+
+	def print_agent_states(self, agent):
+		# Print all the states for the agent
+		print("Agent {0}".format(agent))
+		pp = pprint.PrettyPrinter(indent=4)
+		pp.pprint({state : set(self.get_reachable_states(state, agent)) for state in self.rows[agent]})
+
+	def get_agent_states(self, agent):
+		# Get all states considered possible for this agent
+		return self.rows[agent].keys()
+
+	def get_reachable_states(self, state, agent):
+		# From a state, return all states that the agent has a relation to
+		return Bitset_View(self.rows[agent][state] & self.live)
+
+	def knows_set(self, agent, truth):
+		# Return the states from which the agent only reaches states in truth
+		outside = self.live & ~truth
+		return bits_from(state for (state, row) in self.rows[agent].items() if row & outside == 0)
+
+	def contains_relation_for_agent(self, from_, to_, agent):
+		# Boolean function for if a relation exists for an agent
+		return to_ in self.get_reachable_states(from_, agent)
+
+	def remove_state(self, removal_state):
+		# Remove a state from the relations: its row for every agent, and its column for all rows
+		for agent in self.rows:
+			self.model.record(self.restore_row, agent, removal_state, self.writable_rows(agent).pop(removal_state))
+		self.model.record(setattr, self, 'live', self.live)
+		self.live &= ~(1 << removal_state)
+		# Check whether the removed state was the current point. If so, replace it
+		self.model.check_true_state(removal_state)
+
+	def restrict_to(self, keep, removed):
+		# Remove all removed states from the relations at once, keep is the bitmask of the remaining states
+		for agent in self.rows:
+			rows = self.writable_rows(agent)
+			self.model.record(self.restore_rows, agent, {state : rows.pop(state) for state in iter_bits(removed)})
+		self.model.record(setattr, self, 'live', self.live)
+		self.live &= keep
+
+	def remove_relations(self, agent, state_from, state_to):
+		# Remove the relation from this state to that state for this agent
+		instrument.count('remove_relations')
+		rows = self.writable_rows(agent)
+		self.model.record(self.restore_row, agent, state_from, rows[state_from])
+		rows[state_from] &= ~(1 << state_to)
+
+	def restore_row(self, agent, state, row):
+		# Put the old row of a state back
+		self.writable_rows(agent)[state] = row
+
+	def restore_rows(self, agent, rows):
+		# Put the old rows of several states back
+		self.writable_rows(agent).update(rows)
+
+	def private_announcement(self, message, agent):
+		# Perform a private announcement to an agent
+		truth = self.model.truth_set(message)
+		rows = self.writable_rows(agent)
+		# Keep only the connections between states that agree on the message
+		for state in rows:
+			row = rows[state] & truth if truth >> state & 1 else rows[state] & ~truth
+			if row != rows[state]:
+				self.model.record(self.restore_row, agent, state, rows[state])
+				rows[state] = row
+
+	def private_belief_update(self, message, agent):
+		# Updates the relations for an agent regarding their personal beliefs
+		truth = self.model.truth_set(message)
+		rows = self.writable_rows(agent)
+		if self.model.verbose > 1:
+			for st in self.model.trues:
+				if st in rows and (rows[st] & self.live & ~truth) >> st & 1:
+					print("Removing reflexive relation {0} for message {1} and agent {2}\n State had values {3}".format(st, message, agent, self.model.state_map.states[st]))
+		# Remove the links to all states in which the message is false
+		for state in rows:
+			if rows[state] & ~truth:
+				self.model.record(self.restore_row, agent, state, rows[state])
+				rows[state] &= truth
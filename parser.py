@@ -5,23 +5,41 @@ from protocol import Protocol
 
 from lark import Lark, exceptions, Transformer, Tree, v_args
 from lark.indenter import Indenter
+from lark.parsers import lalr_analysis
+import copyreg
+import hashlib
+import lark
+import os
+import pickle
 import sys
 
+# The grammar and this module, which builds and pickles the parser, and the directory in which the parser is cached
+GRAMMAR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gram.lark')
+SOURCE = os.path.abspath(__file__)
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '__pycache__')
+# The parsers of this process by start rule, once they are built or loaded
+PARSER = {}
+
 
 @v_args(inline=True)    # Affects the signatures of the methods
 class LogicTreeTransformer(Transformer):
 	'''
 	This class transforms the information as parsed by the parser into
 	the structure in which it can be used in the rest of the program.
+	The formulas it creates are interned, so every distinct subformula is created once.
 	'''
 	def __init__(self):
 		self.vars = {}
 		self._literals = []
 		self._actions = []
 
-	def start(self, literals, truth, actions, protocols, agents):
+	def start(self, literals, truth, *sections):
 		# Is called by Central System, this is what will be returned as input
-		return literals, truth, actions, protocols, agents
+		# The constraints section is optional, without it there are no constraints
+		if len(sections) == 3:
+			sections = ((),) + sections
+		constraints, actions, protocols, agents = sections
+		return literals, truth, constraints, actions, protocols, agents
 
 	def literals(self, *literals):
 		# The list of literals. The literals later in input should match these
@@ -34,6 +52,10 @@ class LogicTreeTransformer(Transformer):
 		# The list of true expressions
 		return expr
 
+	def constraints(self, *expr):
+		# The list of expressions that are true in every state of the model
+		return expr
+
 	def actions(self, *actions):
 		# The list of possible actions
 		return actions
@@ -128,18 +150,89 @@ class TreeIndenter(Indenter):
 	tab_len = 2
 
 
-def parse_input(title):
+def lalr_action(name):
 	'''
-	This function opens the inputfile (with title as given), and inputs that 
-	in the parser. The information contained in the input is returned.
+	Returns the Shift or Reduce action of the LALR parser. The parser compares actions
+	by identity, so a pickled parser has to get these objects back instead of copies.
 	'''
-	expr_parser = Lark(open('gram.lark'), parser="lalr", postlex=TreeIndenter(), transformer=LogicTreeTransformer())
-	expression = expr_parser.parse
+	return getattr(lalr_analysis, name)
+
+copyreg.pickle(lalr_analysis.Action, lambda action: (lalr_action, (action.name,)))
 
-	path = './examples/' + title + '.txt'
-	with open(path, "r") as file:
+def grammar_hash():
+	'''
+	Returns a hash of the grammar, the source of this module and the version of Lark,
+	which changes whenever a parser built before can no longer be used: the indenter and
+	the pickling of the parse actions are defined here.
+	'''
+	digest = hashlib.sha256()
+	for path in [GRAMMAR, SOURCE]:
+		with open(path, 'rb') as file:
+			digest.update(file.read())
+	digest.update(lark.__version__.encode())
+	return digest.hexdigest()
+
+def get_parser(start='start'):
+	'''
+	Returns the parser of the rule start, 'start' for whole inputs or 'expr' for single formulas,
+	which is built only once per process. The parser with its parse tables is also pickled
+	to a cache file named after grammar_hash, so other processes load it instead
+	of building it again.
+	The parser builds a tree, because the transformer keeps the literals and actions of
+	one input: every input gets a new LogicTreeTransformer.
+	'''
+	if start not in PARSER:
+		name = 'gram-{0}.pickle'.format(grammar_hash()[:16])
+		if start != 'start':
+			name = 'gram-{0}-{1}.pickle'.format(grammar_hash()[:16], start)
+		cache = os.path.join(CACHE_DIR, name)
+		try:
+			with open(cache, 'rb') as file:
+				PARSER[start] = pickle.load(file)
+		except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+			with open(GRAMMAR) as file:
+				PARSER[start] = Lark(file, parser="lalr", postlex=TreeIndenter(), start=start)
+			try:
+				# Write to a temporary file first, so no process reads half a cache file
+				os.makedirs(CACHE_DIR, exist_ok=True)
+				temporary = '{0}.{1}'.format(cache, os.getpid())
+				with open(temporary, 'wb') as file:
+					pickle.dump(PARSER[start], file)
+				os.replace(temporary, cache)
+			except OSError:
+				pass
+	return PARSER[start]
+
+def parse_text(text):
+	'''
+	Parses the text of an input file, and returns the information contained in it.
+	'''
+	return LogicTreeTransformer().transform(get_parser().parse(text))
+
+def parse_formula(text, literals):
+	'''
+	Parses a single formula, such as '(Abe knows _ground)', over the literals given.
+	'''
+	transformer = LogicTreeTransformer()
+	transformer._literals = [str(literal) for literal in literals] + ["_true", "_false"]
+	return transformer.transform(get_parser('expr').parse(text))
+
+def input_path(title, path=None):
+	'''
+	Returns the path of the inputfile: the path given, or the example with this title.
+	'''
+	if path is None:
+		path = './examples/' + title + '.txt'
+	return path
+
+def parse_input(title, path=None):
+	'''
+	This function opens the inputfile (with title as given, or at the path given), and inputs that 
+	in the parser. The information contained in the input is returned.
+	'''
+	with open(input_path(title, path), "r") as file:
 		parse_input = file.read()
 
-	return expression(parse_input)
+	return parse_text(parse_input)
 
 	
@@ -0,0 +1,217 @@
+from relations import *
+from bitset import *
+import copy
+import instrument
+import pprint
+
+
+class Partition_Relations(Relations):
+
+	"""
+	The class for the relations in the Kripke model, stored as partitions.
+	The relations:
+		for all agents a class id for every state, and the states still believed possible
+		from a state the agent reaches the states in its class that are believed possible
+	Private announcements only split the classes and private belief updates only shrink
+	the believed states, so neither has to look at single relations.
+	A single relation that is removed is kept as an exception of the state it starts from,
+	in self.removed: for all agents the states each state no longer reaches.
+	The classes of the agents in self.shared are shared with a snapshot.
+	"""
+	def __init__(self, model, agent_names):
+		# Set up the relations for the model, all states start in one class
+		self.model = model
+		self.classes = {}
+		self.members = {}
+		self.beliefs = {}
+		self.next_class = {}
+		self.removed = {}
+		self.shared = set()
+		states = bits_from(self.model.states)
+		for agent in agent_names:
+			self.classes[agent] = {state : 0 for state in self.model.states}
+			self.members[agent] = {0 : states}
+			self.beliefs[agent] = states
+			self.next_class[agent] = 1
+			self.removed[agent] = {}
+
+	@classmethod
+	def from_rows(cls, model, agent_names, rows):
+		# Create the relations from the states reachable from every state as bitmasks, for every agent.
+		# The states with the same row form a class, and a state is believed possible when it reaches itself.
+		# This only merges classes that reach no states at all, which changes nothing they reach.
+		relations = cls.__new__(cls)
+		relations.model = model
+		relations.classes = {}
+		relations.members = {}
+		relations.beliefs = {}
+		relations.next_class = {}
+		relations.removed = {}
+		relations.shared = set()
+		for agent in agent_names:
+			class_ids = {}
+			classes = {}
+			members = {}
+			for (state, row) in rows[agent].items():
+				class_id = class_ids.setdefault(row, len(class_ids))
+				classes[state] = class_id
+				members[class_id] = members.get(class_id, 0) | 1 << state
+			relations.classes[agent] = classes
+			relations.members[agent] = members
+			relations.beliefs[agent] = bits_from(state for (state, row) in rows[agent].items() if row >> state & 1)
+			relations.next_class[agent] = len(class_ids)
+			relations.removed[agent] = {}
+		return relations
+
+	def snapshot(self, model):
+		# Return a copy of the relations for another model, sharing the classes until they are changed
+		relations = copy.copy(self)
+		relations.model = model
+		relations.classes = dict(self.classes)
+		relations.members = dict(self.members)
+		relations.beliefs = dict(self.beliefs)
+		relations.next_class = dict(self.next_class)
+		relations.removed = dict(self.removed)
+		self.shared = set(self.classes)
+		relations.shared = set(self.classes)
+		return relations
+
+	def writable_classes(self, agent):
+		# Return the classes and their members for the agent to change them, copying them first if they are shared
+		if agent in self.shared:
+			self.classes[agent] = instrument.copied(dict(self.classes[agent]))
+			self.members[agent] = instrument.copied(dict(self.members[agent]))
+			self.removed[agent] = dict(self.removed[agent])
+			self.shared.remove(agent)
+		return self.classes[agent], self.members[agent]
+
+	def print_agent_states(self, agent):
+		# Print all the states for the agent
+		print("Agent {0}".format(agent))
+		pp = pprint.PrettyPrinter(indent=4)
+		pp.pprint({state : set(self.get_reachable_states(state, agent)) for state in self.classes[agent]})
+
+	def get_agent_states(self, agent):
+		# Get all states considered possible for this agent
+		return self.classes[agent].keys()
+
+	def get_reachable_states(self, state, agent):
+		# From a state, return all states that the agent has a relation to
+		members = self.members[agent][self.classes[agent][state]]
+		return Bitset_View(members & self.beliefs[agent] & ~self.removed[agent].get(state, 0))
+
+	def knows_set(self, agent, truth):
+		# Return the states from which the agent only reaches states in truth, once per class
+		beliefs = self.beliefs[agent]
+		states = 0
+		for members in self.members[agent].values():
+			if members & beliefs & ~truth == 0:
+				states |= members
+		# States with removed relations can know what the rest of their class does not
+		for (state, removed) in self.removed[agent].items():
+			if state in self.classes[agent]:
+				if self.members[agent][self.classes[agent][state]] & beliefs & ~removed & ~truth == 0:
+					states |= 1 << state
+				else:
+					states &= ~(1 << state)
+		return states
+
+	def contains_relation_for_agent(self, from_, to_, agent):
+		# Boolean function for if a relation exists for an agent
+		return to_ in self.get_reachable_states(from_, agent)
+
+	def remove_state(self, removal_state):
+		# Remove a state from the relations
+		bit = 1 << removal_state
+		for agent in self.classes:
+			# Remove state from its class and from the believed states
+			classes, members = self.writable_classes(agent)
+			class_id = classes.pop(removal_state)
+			self.model.record(self.restore_state, agent, removal_state, class_id, members[class_id], self.beliefs[agent])
+			members[class_id] &= ~bit
+			if members[class_id] == 0:
+				del members[class_id]
+			self.beliefs[agent] &= ~bit
+		# Check whether the removed state was the current point. If so, replace it
+		self.model.check_true_state(removal_state)
+
+	def restrict_to(self, keep, removed):
+		# Remove all removed states from the relations at once, keep is the bitmask of the remaining states
+		for agent in self.classes:
+			classes, members = self.writable_classes(agent)
+			old_classes = {state : classes.pop(state) for state in iter_bits(removed)}
+			old_members = {class_id : members[class_id] for class_id in set(old_classes.values())}
+			self.model.record(self.restore_states, agent, old_classes, old_members, self.beliefs[agent])
+			for class_id in old_members:
+				if members[class_id] & keep:
+					members[class_id] &= keep
+				else:
+					del members[class_id]
+			self.beliefs[agent] &= keep
+
+	def restore_states(self, agent, old_classes, old_members, beliefs):
+		# Put removed states back into their classes and the believed states
+		classes, members = self.writable_classes(agent)
+		classes.update(old_classes)
+		members.update(old_members)
+		self.beliefs[agent] = beliefs
+
+	def restore_state(self, agent, state, class_id, class_members, beliefs):
+		# Put a removed state back into its class and the believed states
+		classes, members = self.writable_classes(agent)
+		classes[state] = class_id
+		members[class_id] = class_members
+		self.beliefs[agent] = beliefs
+
+	def restore_class(self, agent, class_id, new_id, class_members):
+		# Undo the split of a class into itself and a new class
+		classes, members = self.writable_classes(agent)
+		for state in iter_bits(members.pop(new_id)):
+			classes[state] = class_id
+		members[class_id] = class_members
+		self.next_class[agent] = new_id
+
+	def remove_relations(self, agent, state_from, state_to):
+		# Remove the relation from this state to that state for this agent, as an exception of the state
+		instrument.count('remove_relations')
+		if self.contains_relation_for_agent(state_from, state_to, agent):
+			self.writable_classes(agent)
+			removed = self.removed[agent]
+			self.model.record(self.restore_removed, agent, state_from, removed.get(state_from))
+			removed[state_from] = removed.get(state_from, 0) | 1 << state_to
+
+	def restore_removed(self, agent, state, removed):
+		# Put back the relations removed from a state
+		self.writable_classes(agent)
+		if removed is None:
+			del self.removed[agent][state]
+		else:
+			self.removed[agent][state] = removed
+
+	def private_announcement(self, message, agent):
+		# Perform a private announcement to an agent by splitting every class on the message
+		truth = self.model.truth_set(message)
+		classes, members = self.writable_classes(agent)
+		for class_id in list(members):
+			pos_states = members[class_id] & truth
+			neg_states = members[class_id] & ~truth
+			if pos_states and neg_states:
+				# The states where the message is false move to a new class
+				new_id = self.next_class[agent]
+				self.next_class[agent] += 1
+				self.model.record(self.restore_class, agent, class_id, new_id, members[class_id])
+				members[class_id] = pos_states
+				members[new_id] = neg_states
+				for state in iter_bits(neg_states):
+					classes[state] = new_id
+
+	def private_belief_update(self, message, agent):
+		# Updates the relations for an agent regarding their personal beliefs
+		truth = self.model.truth_set(message)
+		if self.model.verbose > 1:
+			for st in self.model.trues:
+				if st in self.classes[agent] and (self.beliefs[agent] & ~truth) >> st & 1:
+					print("Removing reflexive relation {0} for message {1} and agent {2}\n State had values {3}".format(st, message, agent, self.model.state_map.states[st]))
+		# States in which the message is false are no longer reachable from any state
+		self.model.record(self.beliefs.__setitem__, agent, self.beliefs[agent])
+		self.beliefs[agent] &= truth
@@ -0,0 +1,55 @@
+from formula import *
+import instrument
+
+
+class Precondition_Index():
+	"""
+	Keeps for every action of an agent the states in which the agent does not know its
+	precondition, so the actions that are available can be found again after an announcement
+	without evaluating every precondition again.
+	An action is available when this set of failing states is empty. The sets are kept for one
+	model, the base. In a model of the same lineage, which only has fewer states, the failing
+	states of a precondition without knowledge are the failing states of the base that are left,
+	unless a removed state made the precondition false: then the agent reaches fewer such
+	states, and the precondition is evaluated again. Preconditions with knowledge, and all
+	preconditions in a model of another lineage, are always evaluated again.
+	"""
+
+	def __init__(self, agent):
+		self.agent = agent
+		self.lineage = None
+
+	def evaluate(self, model, action):
+		# Return the states of the model in which the agent does not know the precondition of the action
+		instrument.count('preconditions_evaluated')
+		return model.live_set() & ~model.truth_set(Knows(self.agent.name, action['act'].preconditions))
+
+	def rebuild(self, model):
+		# Evaluate all preconditions in the model, which becomes the base
+		self.lineage = model.lineage
+		self.live = model.live_set()
+		self.modal = [action['act'].preconditions.modal_depth() > 0 for action in self.agent.actions]
+		self.truths = [model.truth_set(action['act'].preconditions) for action in self.agent.actions]
+		self.failing = [self.evaluate(model, action) for action in self.agent.actions]
+
+	def available_actions(self, model):
+		# Return the actions available to the agent in the model, in the order of its actions
+		live = model.live_set()
+		if self.lineage is not model.lineage or live & ~self.live or len(self.failing) != len(self.agent.actions):
+			self.rebuild(model)
+			failing = self.failing
+		else:
+			removed = self.live & ~live
+			failing = []
+			for (index, action) in enumerate(self.agent.actions):
+				if self.modal[index] or (self.failing[index] and removed & ~self.truths[index]):
+					failing.append(self.evaluate(model, action))
+				else:
+					instrument.count('preconditions_skipped')
+					failing.append(self.failing[index] & live)
+			# Outside a transaction the model is not rolled back, so it is the base from now on
+			if model.journal is None:
+				self.live = live
+				self.truths = [truth & live for truth in self.truths]
+				self.failing = failing
+		return [action for (action, states) in zip(self.agent.actions, failing) if not states]
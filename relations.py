@@ -1,5 +1,8 @@
 from kripkemodel import *
 from formula import *
+from bitset import *
+import copy
+import instrument
 import pprint
 
 
@@ -10,15 +13,51 @@ class Relations():
 	The relations:
 		for all agents a dictionary from a state to a set of states
 		each state in that set is not distinguishable from this one
+	A snapshot shares the dictionaries and sets with the relations it was taken from.
+	For every agent with shared relations, self.cow holds the states whose set was copied
+	since, or None if the dictionary itself is still shared.
 	"""
 	def __init__(self, model, agent_names):
 		# Set up the relations for the model.
 		self.model = model
 		self.relations = {}
+		self.cow = {}
 		for agent in agent_names:
 			rel = self.relation_states(agent)
 			self.relations[agent] = rel
 
+	def snapshot(self, model):
+		# Return a copy of the relations for another model, sharing everything until it is changed
+		relations = copy.copy(self)
+		relations.model = model
+		relations.relations = dict(self.relations)
+		self.cow = {agent : None for agent in self.relations}
+		relations.cow = {agent : None for agent in self.relations}
+		return relations
+
+	def writable_states(self, agent):
+		# Return the dictionary of the agent to change it, copying it first if it is shared
+		if agent in self.cow and self.cow[agent] is None:
+			self.relations[agent] = instrument.copied(dict(self.relations[agent]))
+			self.cow[agent] = set()
+		return self.relations[agent]
+
+	def writable_row(self, agent, state):
+		# Return the set of states reachable from state to change it, copying it first if it is shared
+		reach = self.writable_states(agent)
+		if agent in self.cow and state not in self.cow[agent]:
+			reach[state] = instrument.copied(set(reach[state]))
+			self.cow[agent].add(state)
+		return reach[state]
+
+	@classmethod
+	def from_rows(cls, model, agent_names, rows):
+		# Create the relations from the states reachable from every state as bitmasks, for every agent
+		relations = cls.__new__(cls)
+		relations.model = model
+		relations.cow = {}
+		relations.relations = {agent : {state : set(iter_bits(row)) for (state, row) in rows[agent].items()} for agent in agent_names}
+		return relations
 
 	def relation_states(self, agent):
 		# For each agent, set up the dictionary from state to set of states
@@ -42,6 +81,12 @@ class Relations():
 		reach = self.relations[agent]
 		return reach[state]
 
+	def knows_set(self, agent, truth):
+		# Return the states from which the agent only reaches states in truth, as a bitmask
+		truth_states = set(iter_bits(truth))
+		reach = self.relations[agent]
+		return bits_from(state for state in reach if reach[state] <= truth_states)
+
 	def contains_relation_for_agent(self, from_, to_, agent):
 		# Boolean function for if a relation exists for an agent
 		states = self.relations[agent]
@@ -57,22 +102,37 @@ class Relations():
 		# For all agents
 		for agent in self.relations:
 		# Remove state as key from states dictionary
-			del self.relations[agent][removal_state]
+			reach = self.writable_states(agent)
+			self.model.record(self.restore_row, agent, removal_state, reach.pop(removal_state))
 
 			# Remove state as value from all state dictionaries
 			remove = []
-			reach = self.relations[agent]
 			for state in reach:
 				set_states = reach[state]
 				if removal_state in set_states:
 					remove.append((state,removal_state))
 			for (state, remove_state) in remove:
-				reach[state].remove(removal_state)
+				self.writable_row(agent, state).remove(removal_state)
+			self.model.record(self.restore_column, agent, removal_state, [state for (state, remove_state) in remove])
 		# Check whether the removed state was the current point. If so, replace it
 		self.model.check_true_state(removal_state)
 
+	def restrict_to(self, keep, removed):
+		# Remove all removed states from the relations at once, keep is the bitmask of the remaining states
+		removed_states = set(iter_bits(removed))
+		for agent in self.relations:
+			reach = self.writable_states(agent)
+			rows = {state : reach.pop(state) for state in removed_states}
+			self.model.record(self.restore_rows, agent, rows)
+			# Remove the removed states from the remaining rows
+			for state in reach:
+				if not reach[state].isdisjoint(removed_states):
+					self.model.record(self.restore_relations, agent, state, reach[state] & removed_states)
+					self.writable_row(agent, state).difference_update(removed_states)
+
 	def remove_relations(self, agent, state_from, state_to):
 		# Remove the relation from this state to that state for this agent
+		instrument.count('remove_relations')
 		reach = self.relations[agent]
 		remove = []
 		for state in reach:
@@ -81,42 +141,55 @@ class Relations():
 				if state_to in set_states:
 					remove.append((state, state_to))
 		for (state, state_to) in remove:
-			reach[state].remove(state_to)
+			self.writable_row(agent, state).remove(state_to)
+			self.model.record(self.restore_relations, agent, state, (state_to,))
 		
+	def restore_row(self, agent, state, row):
+		# Put the removed relations of a state back
+		self.writable_states(agent)[state] = row
+
+	def restore_rows(self, agent, rows):
+		# Put the removed relations of several states back
+		self.writable_states(agent).update(rows)
+
+	def restore_relations(self, agent, state_from, states_to):
+		# Put removed relations from this state to those states back
+		self.writable_row(agent, state_from).update(states_to)
+
+	def restore_column(self, agent, state_to, states_from):
+		# Put removed relations from those states to this state back
+		for state in states_from:
+			self.writable_row(agent, state).add(state_to)
+
 	def private_announcement(self, message, agent):
 		# Perform a private announcement to an agent
-		reach = self.relations[agent]
-		pos_states = []
-		neg_states = []
+		reach = self.writable_states(agent)
 		# For states for agent, determine if message evals true or false
-		for state in reach:
-			if message.evaluate(self.model, state):
-				pos_states.append(state)
-			else:
-				neg_states.append(state)
+		truth = self.model.truth_set(message)
+		pos_states = set(iter_bits(truth))
+		neg_states = set(reach) - pos_states
 
 		# Remove all connections between true and false evaluations both ways
-		for p_state in pos_states:
-			for n_state in neg_states:
-				self.remove_relations(agent, p_state, n_state)
-				self.remove_relations(agent, n_state, p_state)
+		for state in reach:
+			other_states = neg_states if state in pos_states else pos_states
+			if not reach[state].isdisjoint(other_states):
+				self.model.record(self.restore_relations, agent, state, reach[state] & other_states)
+				self.writable_row(agent, state).difference_update(other_states)
 
 	def private_belief_update(self, message, agent):
 		# Updates the relations for an agent regarding their personal beliefs
-		reach = self.relations[agent]
-		# For all possible states
+		reach = self.writable_states(agent)
+		truth = Bitset_View(self.model.truth_set(message))
+		if self.model.verbose > 1:
+			for st in self.model.trues:
+				if st in reach and st in reach[st] and st not in truth:
+					print("Removing reflexive relation {0} for message {1} and agent {2}\n State had values {3}".format(st, message, agent, self.model.state_map.states[st]))
+		# States in which the message is false are no longer reachable from any state
+		false_states = {state for state in reach if state not in truth}
 		for state in reach:
-			sts = []
-			# Consider all reachable states
-			for st in reach[state]:
-				# if the message evaluates as false, remove the link to that state
-				if not message.evaluate(self.model, st):
-					if st == state and st in self.model.trues:
-						if self.model.verbose > 1:
-							print("Removing reflexive relation {0} for message {1} and agent {2}\n State had values {3}".format(st, message, agent, self.model.state_map.states[st]))
-					sts.append(st)
-			for s in sts:
-				self.remove_relations(agent, state, s)
+			if not reach[state].isdisjoint(false_states):
+				self.model.record(self.restore_relations, agent, state, reach[state] & false_states)
+				self.writable_row(agent, state).difference_update(false_states)
 
 
 
@@ -0,0 +1,132 @@
+"""
+Generates hidden protocol scenarios in the input format of gram.lark.
+
+	python scenario.py --literals 10 --agents 3 --actions 4 --protocols 2 --depth 2 --seed 1 > examples/generated.txt
+
+A generated scenario has a hidden valuation of the literals. The truth section states part
+of it, and every postcondition, protocol conclusion and piece of information is true in it,
+so announcements never remove all true worlds.
+"""
+import argparse
+import random
+import string
+
+
+def letters(index):
+	# Return a name of lowercase letters for a number: a, b, ..., z, ba, bb, ...
+	name = string.ascii_lowercase[index % 26]
+	while index >= 26:
+		index //= 26
+		name = string.ascii_lowercase[index % 26] + name
+	return name
+
+
+class Scenario_Generator():
+	"""
+	Creates a random scenario with the numbers of literals, agents, actions and protocols given.
+	Formulas are nested up to depth connectives deep. Preconditions and goals can use knowledge,
+	the formulas that are announced only use the literals.
+	"""
+
+	def __init__(self, literals, agents, actions, protocols, depth, seed=0):
+		self.random = random.Random(seed)
+		self.literals = ['_lit' + letters(index) for index in range(literals)]
+		self.agent_names = ['A' + letters(index) for index in range(agents)]
+		self.action_names = ['act' + letters(index) for index in range(actions)]
+		self.protocol_names = ['prot' + letters(index) for index in range(protocols)]
+		self.depth = depth
+		# The hidden valuation that all announcements are true in
+		self.valuation = {lit : self.random.random() < 0.5 for lit in self.literals}
+
+	def literal(self, lit):
+		# Return the literal as it is true in the hidden valuation
+		if self.valuation[lit]:
+			return lit
+		return '~ ' + lit
+
+	def formula(self, depth, knowledge=False):
+		# Return a random formula as text and its value in the hidden valuation, None if it uses knowledge
+		if depth == 0 or self.random.random() < 0.25:
+			lit = self.random.choice(self.literals)
+			return lit, self.valuation[lit]
+		kinds = ['&', '|', '->', '<->', '~']
+		if knowledge:
+			kinds.append('knows')
+		kind = self.random.choice(kinds)
+		if kind == '~':
+			text, value = self.formula(depth - 1, knowledge)
+			return '~ ' + text, None if value is None else not value
+		if kind == 'knows':
+			text, value = self.formula(depth - 1, knowledge)
+			return '({0} knows {1})'.format(self.random.choice(self.agent_names), text), None
+		text1, value1 = self.formula(depth - 1, knowledge)
+		text2, value2 = self.formula(depth - 1, knowledge)
+		value = None
+		if value1 is not None and value2 is not None:
+			value = {'&' : value1 and value2, '|' : value1 or value2, '->' : (not value1) or value2, '<->' : value1 == value2}[kind]
+		return '({0} {1} {2})'.format(text1, kind, text2), value
+
+	def true_formula(self):
+		# Return a formula without knowledge that is true in the hidden valuation
+		text, value = self.formula(self.depth)
+		if value:
+			return text
+		return '~ ' + text
+
+	def precondition(self):
+		# Return a precondition, half of the actions can always be performed
+		if self.random.random() < 0.5:
+			return '_true'
+		return self.formula(self.depth, True)[0]
+
+	def goal(self, agent):
+		# Return the goal of an agent: to know the value of a literal
+		lit = self.random.choice(self.literals)
+		return '(({0} knows {1}) | ({0} knows ~ {1}))'.format(agent, lit)
+
+	def generate(self):
+		# Return the text of the scenario
+		lines = ['Vars:']
+		lines.extend('  ' + lit for lit in self.literals)
+		lines.extend(['', 'Truth:'])
+		stated = self.random.sample(self.literals, max(1, len(self.literals) // 2))
+		lines.extend('  ' + self.literal(lit) for lit in self.literals if lit in stated)
+		lines.extend(['', 'Actions:'])
+		for name in self.action_names:
+			lines.append('  ' + name)
+			lines.append('    pre ' + self.precondition())
+			lines.append('    post ' + self.true_formula())
+			lines.append('')
+		lines.extend(['Protocols:'])
+		for name in self.protocol_names:
+			lines.append('  ' + name)
+			lines.append('    if ' + self.formula(self.depth)[0])
+			lines.append('    then ' + self.true_formula())
+			lines.append('')
+		lines.extend(['Agents:'])
+		for agent in self.agent_names:
+			lines.append('  ' + agent)
+			lines.append('    Info:')
+			lines.extend('      ' + self.true_formula() for _ in range(self.random.randint(1, 3)))
+			lines.append('    Acts:')
+			acts = self.random.sample(self.action_names, self.random.randint(0, len(self.action_names)))
+			lines.extend('      ' + name for name in self.action_names if name in acts)
+			lines.append('    Goal:')
+			lines.append('      ' + self.goal(agent))
+		return '\n'.join(lines) + '\n'
+
+	def config(self, title, path, rounds=1):
+		# Return the configuration to run the scenario written to path
+		return {'title' : title, 'path' : path, 'agent_names' : list(self.agent_names), 'turns' : [], 'rounds' : rounds}
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description="Generate a hidden protocol scenario.")
+	parser.add_argument('--literals', type=int, default=8)
+	parser.add_argument('--agents', type=int, default=2)
+	parser.add_argument('--actions', type=int, default=4)
+	parser.add_argument('--protocols', type=int, default=1)
+	parser.add_argument('--depth', type=int, default=2)
+	parser.add_argument('--seed', type=int, default=0)
+	args = parser.parse_args()
+	print(Scenario_Generator(args.literals, args.agents, args.actions, args.protocols, args.depth, args.seed).generate(), end='')
@@ -0,0 +1,52 @@
+"""
+A cache of examples after setup, so a Central_System can start from a warm model.
+A cache file holds the parsed input, pickled before the agents get a model, and the model
+after the beliefs of the agents are set up, serialized by its to_bytes method as bitmasks
+(or BDD nodes). The file is named after a hash of the input file, the grammar and the
+configuration options that change the model after setup.
+"""
+from parser import grammar_hash
+
+import hashlib
+import os
+import pickle
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '__pycache__', 'scenarios')
+# Changes whenever the contents of a cache file change, including the attributes of the pickled agents
+CACHE_FORMAT = 3
+
+
+def scenario_key(path, config):
+	# Return the hash of everything the model after setup depends on
+	with open(path, 'rb') as file:
+		text = file.read()
+	options = repr((CACHE_FORMAT, grammar_hash(), config.get('engine', 'explicit'), list(config['agent_names'])))
+	return hashlib.sha256(text + options.encode()).hexdigest()
+
+def cache_path(path, config):
+	# Return the cache file of the input file with this configuration
+	title = os.path.splitext(os.path.basename(path))[0]
+	return os.path.join(CACHE_DIR, '{0}-{1}.bin'.format(title, scenario_key(path, config)[:16]))
+
+def load_scenario(path, config):
+	# Return the parsed input and the model after setup from the cache, or None if they are not cached
+	try:
+		with open(cache_path(path, config), 'rb') as file:
+			parsed, model_type, data = pickle.load(file)
+	except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, ValueError):
+		return None
+	model = model_type.from_bytes(data, config.get('compact', False), config.get('relations'))
+	return pickle.loads(parsed), model
+
+def save_scenario(path, config, parsed, model):
+	# Store the parsed input (already pickled) and the model after setup in the cache
+	cache = cache_path(path, config)
+	try:
+		# Write to a temporary file first, so no process reads half a cache file
+		os.makedirs(CACHE_DIR, exist_ok=True)
+		temporary = '{0}.{1}'.format(cache, os.getpid())
+		with open(temporary, 'wb') as file:
+			pickle.dump((parsed, type(model), model.to_bytes()), file)
+		os.replace(temporary, cache)
+	except OSError:
+		pass
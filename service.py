@@ -0,0 +1,163 @@
+"""
+Runs examples on request in a long-running process, which keeps the parser and the
+models after setup in memory.
+
+	python service.py                              reads requests from stdin, answers on stdout
+	python service.py --socket /tmp/hidden.sock    answers the connections to a Unix socket
+
+Every request is a line of JSON, and is answered with a line of JSON:
+
+	{"id": 1, "title": "language", "seed": 3, "queries": ["(Abe knows _ground)"]}
+	{"id": 2, "path": "examples/generated.txt", "config": {"agent_names": ["Aa", "Ab"], "engine": "bdd"}, "seed": 0}
+
+The title is one of the examples of configs.py, whose configuration the options in config
+change, or the title of the example at path. Without a seed the run is not seeded, and
+without a true_state the true state is chosen at random. The answer holds the true state
+the run started from, the performed actions, whether the agents achieved their goals and
+the value of every query in the true state after the run. With minimize in the config,
+queries may only be about the literals minimize keeps. A request that fails is answered
+with its id and an error.
+
+The example is parsed and set up only the first time it is requested with a configuration,
+later requests restart from the model after setup, as batch.py does. A run with seed s
+performs the same actions as a single run after random.seed(s). Connections to the socket
+are answered one after another. When the service ends it waits for the worker processes
+of the systems it kept to stop.
+"""
+from batch import run_sample, setup_system
+from configs import CONFIGS
+from parser import input_path, parse_formula
+from scenario_cache import scenario_key
+
+import argparse
+import collections
+import contextlib
+import json
+import os
+import random
+import socketserver
+import sys
+import traceback
+
+
+class Scenario_Service():
+	"""
+	Answers requests to run examples. The central systems set up for the examples are kept,
+	the ones used least recently are dropped when there are more than keep. The worker
+	processes of a system are stopped when it is dropped, and when the service is closed.
+	"""
+
+	def __init__(self, keep=16):
+		self.keep = keep
+		self.systems = collections.OrderedDict()
+
+	def config(self, request):
+		# Return the configuration of the example requested
+		title = request.get('title')
+		if title is None:
+			assert 'path' in request, "A request needs a title or a path"
+			title = os.path.splitext(os.path.basename(request['path']))[0]
+		config = dict(CONFIGS.get(title, {'turns' : [], 'rounds' : 1}), title=title)
+		config.update(request.get('config', {}))
+		if 'path' in request:
+			config['path'] = request['path']
+		assert 'agent_names' in config, "The configuration of {0} needs agent_names".format(title)
+		return config
+
+	def system(self, config):
+		# Return the central system of the example, which is set up the first time it is asked for
+		path = input_path(config['title'], config.get('path'))
+		key = (scenario_key(path, config), json.dumps(config, sort_keys=True))
+		if key in self.systems:
+			self.systems.move_to_end(key)
+		else:
+			self.systems[key] = setup_system(config)
+			if len(self.systems) > self.keep:
+				self.systems.popitem(last=False)[1].shutdown(wait=False)
+		return self.systems[key]
+
+	def handle(self, request):
+		# Run the example of the request, and return the answer
+		system = self.system(self.config(request))
+		seed = request.get('seed')
+		if seed is None:
+			seed = random.randrange(2 ** 32)
+		queries = {query : parse_formula(query, system.library) for query in request.get('queries', [])}
+		if system.minimize_literals is not None:
+			# The merged states only keep the values of the literals minimize was given
+			for query, formula in queries.items():
+				lost = formula.literals() - set(system.minimize_literals) - {'_true', '_false'}
+				assert not lost, "Query {0} is about {1}, which the states merged by minimize do not keep".format(query, ', '.join(sorted(lost)))
+		result = run_sample(system, seed, request.get('true_state'))
+		result['id'] = request.get('id')
+		result['queries'] = {query : bool(formula.evaluate(system.model, system.model.true_state)) for query, formula in queries.items()}
+		return result
+
+	def answer(self, line):
+		# Answer a line of JSON with a line of JSON
+		request = {}
+		try:
+			request = json.loads(line)
+			# Nothing the run prints may end up between the answers
+			with contextlib.redirect_stdout(sys.stderr):
+				result = self.handle(request)
+		except (Exception, SystemExit) as error:
+			traceback.print_exc(file=sys.stderr)
+			result = {'id' : request.get('id') if isinstance(request, dict) else None, 'error' : str(error) or type(error).__name__}
+		return json.dumps(result) + '\n'
+
+	def close(self):
+		# Drop all systems, and stop their worker processes
+		while self.systems:
+			self.systems.popitem()[1].shutdown()
+
+	def serve(self, input, output):
+		# Answer every line of input, until it ends
+		for line in input:
+			if line.strip():
+				output.write(self.answer(line))
+				output.flush()
+
+
+class Request_Handler(socketserver.StreamRequestHandler):
+	"""
+	Answers the requests of one connection to the socket with the service of the server.
+	"""
+	def handle(self):
+		input = (line.decode() for line in self.rfile)
+		output = Socket_Writer(self.wfile)
+		self.server.service.serve(input, output)
+
+
+class Socket_Writer():
+	"""
+	Writes the answers as text to the binary file of a connection.
+	"""
+	def __init__(self, file):
+		self.file = file
+
+	def write(self, text):
+		self.file.write(text.encode())
+
+	def flush(self):
+		self.file.flush()
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description="Run examples on request, from lines of JSON.")
+	parser.add_argument('--socket', help="the path of a Unix socket to answer on, instead of stdin")
+	parser.add_argument('--keep', type=int, default=16, help="the number of examples to keep set up")
+	args = parser.parse_args()
+
+	service = Scenario_Service(args.keep)
+	try:
+		if args.socket is None:
+			service.serve(sys.stdin, sys.stdout)
+		else:
+			if os.path.exists(args.socket):
+				os.remove(args.socket)
+			with socketserver.UnixStreamServer(args.socket, Request_Handler) as server:
+				server.service = service
+				server.serve_forever()
+	finally:
+		service.close()
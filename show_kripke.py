@@ -14,11 +14,10 @@ def save_visual(graph, version):
 def create_visual_kripke_for_agent(model, agent, version):
 	# create a graph from kripke input
 	graph = nx.DiGraph()
-	states = [str(x) for x in model.states]
-	graph.add_nodes_from(model.states)
-	rel = model.relations.relations[agent]
-	for state in rel:
-		for st in rel[state]:
+	# The states and relations are read through the model, so it works with either engine
+	graph.add_nodes_from(model.get_agent_states(agent))
+	for state in model.get_agent_states(agent):
+		for st in model.get_reachable_states(state, agent):
 			graph.add_edge(state, st)
 	# save the graph to a file
 	save_visual(graph, version)
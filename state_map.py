@@ -1,25 +1,139 @@
 from agent import *
 from formula import *
+from bitset import *
+from constraints import *
 
+import copy
+import instrument
 import itertools
 import pprint
 
 
+class Bitset_States():
+	"""
+	The states of a compact state map.
+	Every state is stored as a single bit of one integer. The index of a state
+	is its valuation, or codes holds the valuation of every state: the literal at bit
+	position p is true when bit p of the valuation is set.
+	The valuation dictionaries are only created when a state is looked up.
+	"""
+
+	def __init__(self, literals, live, codes=None):
+		self.literals = literals
+		self.live = live
+		self.count = count_bits(live)
+		self.codes = codes
+
+	def __getitem__(self, state):
+		# Create the valuation of a state, as the dictionary state map would store it
+		if state not in self:
+			raise KeyError(state)
+		if self.codes is not None:
+			state = self.codes[state]
+		top = len(self.literals) - 1
+		return {lit : bool(state >> (top - index) & 1) for (index, lit) in enumerate(self.literals)}
+
+	def __delitem__(self, state):
+		if state not in self:
+			raise KeyError(state)
+		self.live &= ~(1 << state)
+		self.count -= 1
+
+	def __contains__(self, state):
+		return state >= 0 and bool(self.live >> state & 1)
+
+	def __iter__(self):
+		return iter_bits(self.live)
+
+	def __len__(self):
+		return self.count
+
+	def __repr__(self):
+		return repr(dict(self.items()))
+
+	def keys(self):
+		return Bitset_View(self.live)
+
+	def values(self):
+		return [self[state] for state in self]
+
+	def items(self):
+		return [(state, self[state]) for state in self]
+
+
 class State_Map():
 	"""
 	The class to create a state map. 
-	This contains the valuations of literals for every state
+	This contains the valuations of literals for every state.
+	In compact mode the states are stored as bits in an integer instead of one dictionary per state.
+	Without constraints the index of a state is its valuation. With constraints, only the
+	states in which all constraints are true are created, and they are numbered 0 to k-1 in
+	the order of their valuations: codes holds the valuation of every state. Bitmasks of states
+	then have as many bits as there are consistent states, however many literals there are.
+	With live (a bitmask), only the states in it are created.
+	A snapshot shares the dictionary of states until one of the state maps removes a state.
 	"""
 
-	def __init__(self, literals):
+	def __init__(self, literals, compact=False, constraints=(), live=None, codes=None):
 		# Set up state map for every combination of truth in literals
+		self.compact = compact
+		# A valuation is a number, the first literal is the most significant bit
+		self.positions = {lit.formula : len(literals) - 1 - index for (index, lit) in enumerate(literals)}
+		self.patterns = {}
+		self.shared = False
+		if codes is None and constraints:
+			codes = list(consistent_states(literals, constraints))
+			live = (1 << len(codes)) - 1
+		self.codes = codes
+		self.size = 1 << len(literals) if codes is None else len(codes)
+		# The states the state map starts with, only states among them are ever put back
+		self.initial = live
+		if compact:
+			if live is None:
+				live = (1 << self.size) - 1
+			self.states = Bitset_States([lit.formula for lit in literals], live, codes)
+			return
+
 		self.states = {}
+		if live is not None:
+			# Only the live states are created, the valuation of a state follows from its code
+			top = len(literals) - 1
+			for index in iter_bits(live):
+				code = self.code(index)
+				option = [bool(code >> (top - position) & 1) for position in range(len(literals))]
+				self.states[index] = self.create_state(literals, option)
+			self.live = live
+			return
+
+		self.live = (1 << self.size) - 1
 		lit_options = list(itertools.product([False,True], repeat =len(literals)))
 		for index, option in enumerate(lit_options):
 			state_content = self.create_state(literals, option)
 			self.states[index] = state_content
 
 
+	def snapshot(self):
+		# Return a copy of the state map, sharing the states until they are changed
+		state_map = copy.copy(self)
+		if self.compact:
+			state_map.states = instrument.copied(copy.copy(self.states))
+		else:
+			self.shared = True
+			state_map.shared = True
+		return state_map
+
+	def unshare(self):
+		# Copy the dictionary of states if it is shared with a snapshot, before it is changed
+		if self.shared:
+			self.states = instrument.copied(dict(self.states))
+			self.shared = False
+
+	def code(self, state):
+		# Return the valuation of a state as a number
+		if self.codes is None:
+			return state
+		return self.codes[state]
+
 	def create_state(self, literals, option):
 		# Create the full combination for a state
 		state = {lit.formula : val for (lit, val) in zip(literals, option)}
@@ -31,13 +145,76 @@ class State_Map():
 	def print_states(self):
 		# Print the states legibly
 		pp = pprint.PrettyPrinter(indent=4)
-		pp.pprint(self.states)
+		pp.pprint(dict(self.states.items()))
 
 	def eval_in_state(self, state, literal):
 		# Evaluate a literal in the state mentioned
+		if self.compact:
+			return bool(self.code(state) >> self.positions[literal.formula] & 1)
 		temp = self.states[state]
 		return temp[literal.formula]
 
+	def live_states(self):
+		# Return the bitmask of all states still in the state map
+		if self.compact:
+			return self.states.live
+		return self.live
+
+	def literal_states(self, literal):
+		# Return the bitmask of the states in which the literal is true
+		if literal.formula not in self.patterns:
+			position = self.positions[literal.formula]
+			if self.initial is not None:
+				# Only the states the state map started with can be live
+				self.patterns[literal.formula] = bits_from(state for state in iter_bits(self.initial) if self.code(state) >> position & 1)
+			else:
+				# The literal alternates between blocks of false and true states of size 2^position,
+				# the pattern of two blocks is doubled until it covers all states
+				width = 1 << position
+				pattern = ((1 << width) - 1) << width
+				length = 2 * width
+				while length < self.size:
+					pattern |= pattern << length
+					length *= 2
+				self.patterns[literal.formula] = pattern
+		return self.patterns[literal.formula] & self.live_states()
+
 	def remove_state(self, state):
-		# Remove a state from the state map
-		del self.states[state]
\ No newline at end of file
+		# Remove a state from the state map, returns what is needed to restore it
+		if self.compact:
+			del self.states[state]
+			return None
+		self.unshare()
+		self.live &= ~(1 << state)
+		return self.states.pop(state)
+
+	def restrict_to(self, keep):
+		# Remove all states not in keep from the state map, returns what is needed to restore them
+		removed = self.live_states() & ~keep
+		if self.compact:
+			self.states.live &= keep
+			self.states.count -= count_bits(removed)
+			return None
+		self.unshare()
+		self.live &= keep
+		return {state : self.states.pop(state) for state in iter_bits(removed)}
+
+	def restore_states(self, removed, values):
+		# Put removed states back into the state map
+		if self.compact:
+			self.states.live |= removed
+			self.states.count += count_bits(removed)
+			return
+		self.unshare()
+		self.live |= removed
+		self.states.update(values)
+
+	def restore_state(self, state, values):
+		# Put a removed state back into the state map
+		if self.compact:
+			self.states.live |= 1 << state
+			self.states.count += 1
+			return
+		self.unshare()
+		self.live |= 1 << state
+		self.states[state] = values
\ No newline at end of file
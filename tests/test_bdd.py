@@ -0,0 +1,95 @@
+from central_system import *
+from configs import CONFIGS
+from scenario import Scenario_Generator
+
+import pytest
+import random
+
+
+def states(model, states):
+	# Return a set of states of either engine as a Python set
+	if isinstance(model, BDD_Kripke_Model):
+		return set(model.iter_states(states))
+	return set(iter_bits(states))
+
+def write_scenario(directory, seed, single):
+	# Write a generated scenario, whose truth states every literal if single, so it has one true world
+	generator = Scenario_Generator(6, 2, 3, 1, 2, seed)
+	text = generator.generate()
+	if single:
+		head, rest = text.split('\nActions:', 1)
+		truth = '\n'.join('  ' + generator.literal(lit) for lit in generator.literals)
+		text = head.split('Truth:')[0] + 'Truth:\n' + truth + '\n\nActions:' + rest
+	path = directory / 'generated{0}.txt'.format(seed)
+	path.write_text(text)
+	return generator.config('generated{0}'.format(seed), str(path))
+
+def run(config, seed, engine):
+	# Run the example from the seed with the engine, and return what it did and the next random number
+	random.seed(seed)
+	system = Central_System(dict(config, engine=engine), 0)
+	system.run_example()
+	goals = {name : agent.eval_goal() for (name, agent) in system.agents.items()}
+	return system.model.true_state, system.performed_actions, goals, random.random()
+
+@pytest.mark.parametrize('single', [True, False])
+def test_seeded_runs_match_explicit_engine(tmp_path, single):
+	# Both engines make the same random draws, so a seeded run performs the same actions from the same true state
+	for seed in range(10):
+		config = write_scenario(tmp_path, seed, single)
+		assert run(config, seed, 'bdd') == run(config, seed, 'explicit')
+
+def setup(title, engine):
+	# Set up an example with the engine
+	random.seed(0)
+	return Central_System(dict(CONFIGS[title], engine=engine), 0)
+
+def knowledge(model):
+	# Return the states in which every agent knows every literal and its negation
+	result = {}
+	for agent in model.agent_names:
+		for lit in sorted(model.state_map.positions if not isinstance(model, BDD_Kripke_Model) else model.literals):
+			truth = model.literal_set(Literal(lit))
+			result[(agent, lit, True)] = states(model, model.knows_set(agent, truth))
+			result[(agent, lit, False)] = states(model, model.knows_set(agent, model.live_set() & ~truth))
+	return result
+
+@pytest.mark.parametrize('title', ['language', 'social'])
+def test_knows_set_matches_explicit_engine(title):
+	# What the agents know after setup is the same in both engines
+	explicit = setup(title, 'explicit').model
+	bdd = setup(title, 'bdd').model
+	assert states(bdd, bdd.live_set()) == states(explicit, explicit.live_set())
+	assert knowledge(bdd) == knowledge(explicit)
+
+@pytest.mark.parametrize('title', ['language', 'social'])
+def test_drop_unreachable_matches_explicit_engine(title):
+	# Both engines keep the same states when the unreachable states are dropped
+	models = [setup(title, engine).model for engine in ['explicit', 'bdd']]
+	for model in models:
+		model.drop_unreachable()
+	assert states(models[0], models[0].live_set()) == states(models[1], models[1].live_set())
+	assert knowledge(models[0]) == knowledge(models[1])
+
+@pytest.mark.parametrize('title', ['language', 'social'])
+def test_bytes_round_trip(title):
+	# A model rebuilt from its bytes has the same states, true state and knowledge
+	model = setup(title, 'bdd').model
+	copy = BDD_Kripke_Model.from_bytes(model.to_bytes())
+	assert states(copy, copy.live_set()) == states(model, model.live_set())
+	assert copy.true_state == model.true_state
+	assert list(copy.trues) == list(model.trues)
+	assert knowledge(copy) == knowledge(model)
+
+def test_rollback_restores_model():
+	# Announcements in a hypothetical are undone afterwards
+	system = setup('social', 'bdd')
+	model = system.model
+	before = (states(model, model.live_set()), model.true_state, knowledge(model))
+	agent = system.agents[system.agent_names[0]]
+	literal = Literal(sorted(model.literals)[0])
+	with model.hypothetical():
+		model.public_announcement(literal if model.holds(literal, model.true_state) else Negation(literal))
+		model.private_announcement(Literal(sorted(model.literals)[1]), agent)
+		assert (states(model, model.live_set()), model.true_state, knowledge(model)) != before
+	assert (states(model, model.live_set()), model.true_state, knowledge(model)) == before
@@ -0,0 +1,27 @@
+from kripkemodel import *
+from formula import Literal
+
+import random
+import tracemalloc
+
+
+def allocated(compact):
+	# Return the bytes a model of 8 literals without constraints holds on to after setup
+	literals = [Literal('_l' + str(index)) for index in range(8)]
+	random.seed(0)
+	tracemalloc.start()
+	try:
+		model = Kripke_Model(literals, [literals[0]], ['Aa', 'Ab'], 0, compact)
+		return tracemalloc.get_traced_memory()[0], model
+	finally:
+		tracemalloc.stop()
+
+def test_compact_model_uses_a_fraction_of_the_memory():
+	# The compact model keeps its states in one bitmask and its relations as one bitmask per row
+	full, full_model = allocated(False)
+	compact, compact_model = allocated(True)
+	assert compact * 10 < full
+	assert type(compact_model.relations) is Matrix_Relations
+	assert not isinstance(compact_model.states, list)
+	assert list(compact_model.states) == full_model.states
+	assert compact_model.true_state == full_model.true_state
@@ -0,0 +1,42 @@
+from central_system import *
+from scenario import letters
+
+import pytest
+import random
+import time
+
+
+def write_scenario(directory, count):
+	# Write a scenario with count literals, whose constraints fix all but the first two
+	literals = ['_l' + letters(index) for index in range(count)]
+	lines = ['Vars:'] + ['  ' + lit for lit in literals]
+	lines += ['', 'Truth:', '  ' + literals[0], '', 'Constraints:'] + ['  ' + lit for lit in literals[2:]]
+	lines += ['', 'Actions:', '  acta', '    pre _true', '    post ' + literals[0], '', 'Protocols:', '', 'Agents:']
+	lines += ['  Aa', '    Info:', '      ' + literals[0], '    Acts:', '      acta', '    Goal:', '      ((Aa knows {0}) | (Aa knows ~ {0}))'.format(literals[1])]
+	lines += ['  Ab', '    Info:', '      ' + literals[1], '    Acts:', '    Goal:', '      _true']
+	path = directory / 'scaling.txt'
+	path.write_text('\n'.join(lines) + '\n')
+	return {'title' : 'scaling', 'path' : str(path), 'agent_names' : ['Aa', 'Ab'], 'turns' : [], 'rounds' : 1}
+
+def run(config, **options):
+	# Run the scenario with the options, and return the system and the seconds it took
+	random.seed(0)
+	start = time.perf_counter()
+	system = Central_System(dict(config, **options), 0)
+	states = len(system.model.states)
+	system.run_example()
+	return system, states, time.perf_counter() - start
+
+@pytest.mark.parametrize('count', [25, 40])
+def test_explicit_model_scales_with_consistent_states(tmp_path, count):
+	# Only 4 of the 2^count valuations satisfy the constraints, so every backend is about as fast as the BDD engine
+	config = write_scenario(tmp_path, count)
+	bdd, bdd_states, _ = run(config, engine='bdd')
+	for options in [{}, {'relations' : 'matrix'}, {'relations' : 'partition', 'compact' : True}, {'compact' : True, 'minimize' : True, 'drop_unreachable' : True}]:
+		system, states, seconds = run(config, **options)
+		assert bdd_states == 4 and 0 < states <= 4
+		assert seconds < 10, options
+		assert system.performed_actions == bdd.performed_actions
+		assert system.model.valuation(system.model.true_state) == bdd.model.valuation(bdd.model.true_state)
+		assert system.model.live_set().bit_length() <= 4
+		assert [agent.eval_goal() for agent in system.agents.values()] == [agent.eval_goal() for agent in bdd.agents.values()]
@@ -0,0 +1,20 @@
+from central_system import *
+from configs import CONFIGS
+
+import collections
+import instrument
+import random
+
+
+def test_goal_tracker_base_is_not_a_model_copy(monkeypatch):
+	# The base the tracker keeps is a snapshot, not one of the copies of the model the counters are about
+	random.seed(0)
+	system = Central_System(CONFIGS['language'], 0)
+	monkeypatch.setattr(instrument, 'ENABLED', True)
+	monkeypatch.setattr(instrument, 'COUNTERS', collections.Counter())
+	for agent in system.agents.values():
+		agent.tracker.lineage = None
+		status = agent.tracker.status(system.model)
+		assert status == system.model.eval_goal(agent.goal, agent)
+	assert instrument.COUNTERS['goals_evaluated'] == len(system.agents)
+	assert instrument.COUNTERS['model_copies'] == 0
@@ -0,0 +1,23 @@
+from central_system import *
+from configs import CONFIGS
+
+import collections
+import instrument
+import random
+
+
+def test_evaluations_in_states_are_counted_by_the_model(monkeypatch):
+	# Evaluating a few states of a formula at the model counts as many evaluations as evaluating it from the formula
+	random.seed(0)
+	system = Central_System(CONFIGS['language'], 0)
+	model = system.model
+	goal = system.agents['Abe'].goal
+	monkeypatch.setattr(instrument, 'ENABLED', True)
+	monkeypatch.setattr(instrument, 'COUNTERS', collections.Counter())
+	model.changed()
+	states = bits_from(model.states[:2])
+	model.truth_subset(goal, states)
+	goal.evaluate(model, -1)
+	name = 'evaluate.' + type(goal).__name__
+	assert instrument.COUNTERS[name] == 3
+	assert instrument.COUNTERS['evaluate_all.' + type(goal).__name__] == 0
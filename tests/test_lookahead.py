@@ -0,0 +1,89 @@
+from central_system import *
+from configs import CONFIGS
+from scenario import Scenario_Generator
+
+import pytest
+import random
+
+# Generated scenarios in which a goal can be reached with two or three actions, but not with one
+GENERATED = [0, 9, 10, 27, 31, 35]
+
+
+def setup(tmp_path, example, **options):
+	# Set up a bundled example by title, or a generated scenario by seed
+	if isinstance(example, str):
+		config = CONFIGS[example]
+	else:
+		generator = Scenario_Generator(6, 2, 6, 1, 2, example)
+		path = tmp_path / 'generated{0}.txt'.format(example)
+		path.write_text(generator.generate())
+		config = generator.config('generated{0}'.format(example), str(path))
+	random.seed(0)
+	return Central_System(dict(config, **options), 0)
+
+def reachable(agent, depth):
+	# Search the sequences of at most depth actions one by one, without a transposition table
+	model = agent.model
+	for action in agent.find_available_actions(model, 0):
+		with model.hypothetical():
+			model.public_announcement(action['act'].postconditions)
+			if agent.eval_goal() == 1 or (depth > 1 and reachable(agent, depth - 1)):
+				return True
+	return False
+
+@pytest.mark.parametrize('example', ['language', 'social'] + GENERATED)
+def test_transposition_table_finds_what_the_plain_search_finds(tmp_path, example):
+	# With a table shared between searches of increasing depth, the goal is reachable exactly when the plain search reaches it
+	system = setup(tmp_path, example)
+	model = system.model
+	model.rng = Choice_Recorder()
+	for agent in system.agents.values():
+		table = {}
+		for depth in range(1, 4):
+			version = model.version
+			assert agent.goal_reachable(depth, table) == reachable(agent, depth)
+			assert agent.goal_reachable(depth, {}) == reachable(agent, depth)
+			assert model.version == version
+
+def scores(agent, available_actions):
+	# Score the actions one after another, and return the scores and the state of the random module afterwards
+	agent.table = {}
+	result = {action['act'].name : agent.eval_action(action, available_actions) for action in available_actions}
+	return result, random.getstate()
+
+def replayed_scores(agent, available_actions):
+	# Score the actions as a worker would, and make their random choices again as eval_actions does
+	data = agent.model.to_bytes()
+	result = {}
+	for (index, action) in enumerate(available_actions):
+		score, sizes, output = score_action(type(agent.model), data, agent.name, agent.goal, agent.actions, available_actions, index, agent.depth)
+		for size in sizes:
+			random.randrange(size)
+		result[action['act'].name] = score
+	return result, random.getstate()
+
+@pytest.mark.parametrize('example', ['language', 'social'] + GENERATED)
+@pytest.mark.parametrize('depth', [1, 2, 3])
+def test_worker_scores_match_serial_scores(tmp_path, example, depth):
+	# Scoring in a worker gives the same scores and, replayed, the same random draws as scoring here
+	system = setup(tmp_path, example, lookahead=depth)
+	for agent in system.agents.values():
+		available_actions = agent.find_available_actions(system.model, 0)
+		state = random.getstate()
+		serial = scores(agent, available_actions)
+		random.setstate(state)
+		assert replayed_scores(agent, available_actions) == serial
+
+def run(tmp_path, example, **options):
+	# Run an example, and return what it did and the next random number
+	system = setup(tmp_path, example, **options)
+	try:
+		system.run_example()
+	finally:
+		system.shutdown()
+	return system.performed_actions, system.model.true_state, random.random()
+
+@pytest.mark.parametrize('example', ['social', 0, 27])
+def test_runs_with_workers_match_serial_runs(tmp_path, example):
+	# Looking ahead two actions in worker processes performs the same actions as looking ahead here
+	assert run(tmp_path, example, lookahead=2, workers=2) == run(tmp_path, example, lookahead=2)
@@ -0,0 +1,29 @@
+from central_system import *
+from configs import CONFIGS
+
+import pytest
+import random
+
+
+@pytest.mark.parametrize('title', ['language', 'social'])
+def test_truth_holds_in_true_state_after_minimize(title):
+	# The true state keeps the values the truth gives it while bisimilar states are merged
+	for seed in range(3):
+		random.seed(seed)
+		system = Central_System(dict(CONFIGS[title], minimize=True, relations='matrix'), 0)
+		assert all(system.model.holds(expr, system.model.true_state) for expr in system.truth)
+		system.run_example()
+		assert all(system.model.holds(expr, system.model.true_state) for expr in system.truth)
+
+def test_minimize_keeps_true_state():
+	# Merging by fewer literals than the truth is about still keeps the valuation of the true state
+	random.seed(0)
+	model = Central_System(CONFIGS['language'], 0).model
+	true_state = model.true_state
+	valuation = model.valuation(true_state)
+	states = len(model.states)
+	model.minimize(['_first'])
+	assert len(model.states) < states
+	assert model.true_state == true_state
+	assert model.valuation(model.true_state) == valuation
+	assert set(model.trues) <= set(model.states)
@@ -0,0 +1,37 @@
+from lark import Lark
+import parser
+
+import os
+import pytest
+import shutil
+
+EXAMPLES = os.path.join(os.path.dirname(parser.GRAMMAR), 'examples')
+
+
+def fresh_parser():
+	# Build the parser from the grammar, without the cache
+	with open(parser.GRAMMAR) as file:
+		return Lark(file, parser="lalr", postlex=parser.TreeIndenter(), start='start')
+
+@pytest.mark.parametrize('title', ['language', 'social'])
+def test_cached_parser_gives_the_same_trees(tmp_path, monkeypatch, title):
+	# A parser loaded from the cache parses the examples as a parser that was just built
+	monkeypatch.setattr(parser, 'CACHE_DIR', str(tmp_path))
+	monkeypatch.setattr(parser, 'PARSER', {})
+	parser.get_parser()
+	assert os.listdir(str(tmp_path)) == ['gram-{0}.pickle'.format(parser.grammar_hash()[:16])]
+	monkeypatch.setattr(parser, 'PARSER', {})
+	cached = parser.get_parser()
+	with open(os.path.join(EXAMPLES, title + '.txt')) as file:
+		text = file.read()
+	assert cached.parse(text) == fresh_parser().parse(text)
+
+def test_hash_covers_the_parser_module(tmp_path, monkeypatch):
+	# Changing this module, which defines the indenter and the pickling of the parser, changes the hash
+	before = parser.grammar_hash()
+	source = tmp_path / 'parser.py'
+	shutil.copy(parser.SOURCE, str(source))
+	with open(str(source), 'a') as file:
+		file.write('\n# changed\n')
+	monkeypatch.setattr(parser, 'SOURCE', str(source))
+	assert parser.grammar_hash() != before
@@ -0,0 +1,41 @@
+from central_system import *
+from configs import CONFIGS
+from scenario import Scenario_Generator
+
+import contextlib
+import io
+import pytest
+import random
+
+
+# The method as the agents have it, which evaluates every precondition in debug mode
+FIND_AVAILABLE_ACTIONS = Agent.find_available_actions
+
+
+def direct_actions(agent, model):
+	# Return the available actions by evaluating every precondition, as the debug output does
+	with contextlib.redirect_stdout(io.StringIO()):
+		return FIND_AVAILABLE_ACTIONS(agent, model, 2)
+
+@pytest.mark.parametrize('example', ['language', 'social', 0, 9, 27, 31])
+@pytest.mark.parametrize('lookahead', [1, 2])
+def test_index_finds_the_actions_every_precondition_gives(tmp_path, monkeypatch, example, lookahead):
+	# Every time the index is asked, in a run and in the hypothetical updates of scoring, it gives the direct answer
+	asked = []
+	def checked(agent, model, verbose):
+		actions = FIND_AVAILABLE_ACTIONS(agent, model, verbose)
+		assert actions == direct_actions(agent, model)
+		asked.append(agent.name)
+		return actions
+	monkeypatch.setattr(Agent, 'find_available_actions', checked)
+	if isinstance(example, str):
+		config = CONFIGS[example]
+	else:
+		generator = Scenario_Generator(6, 2, 6, 1, 2, example)
+		path = tmp_path / 'generated{0}.txt'.format(example)
+		path.write_text(generator.generate())
+		config = generator.config('generated{0}'.format(example), str(path))
+	random.seed(0)
+	system = Central_System(dict(config, lookahead=lookahead), 0)
+	system.run_example()
+	assert asked
@@ -0,0 +1,61 @@
+from central_system import *
+from configs import CONFIGS
+from bitset import *
+
+import random
+
+
+def setup(backend):
+	# Set up the language example with the relations backend
+	random.seed(0)
+	return Central_System(dict(CONFIGS['language'], relations=backend), 0).model
+
+def rows(model):
+	# Return the states reachable from every state as bitmasks, for every agent
+	return {agent : {state : bits_from(model.get_reachable_states(state, agent)) for state in model.states} for agent in model.agent_names}
+
+def knows(model):
+	# Return the states in which every agent knows every literal
+	literals = [Literal(lit) for lit in model.state_map.positions]
+	return {(agent, literal.formula) : model.knows_set(agent, model.literal_set(literal)) for agent in model.agent_names for literal in literals}
+
+def test_removed_relations_match_between_backends():
+	# Remove the same relations in every backend, then roll them back
+	models = {backend : setup(backend) for backend in RELATIONS}
+	before = {backend : (rows(model), knows(model)) for (backend, model) in models.items()}
+	assert all(state == before['dict'] for state in before.values())
+	for (backend, model) in models.items():
+		with model.hypothetical():
+			for agent in model.agent_names:
+				for state in model.states[::3]:
+					for st in list(model.get_reachable_states(state, agent))[::2]:
+						model.relations.remove_relations(agent, state, st)
+			model.changed()
+			removed = (rows(model), knows(model))
+			assert removed != before['dict']
+			if backend == 'dict':
+				expected = removed
+			assert removed == expected, backend
+		assert (rows(model), knows(model)) == before[backend]
+
+def test_remove_one_relation_in_partition():
+	# Removing one relation changes what its state reaches and knows, and nothing else, until it is rolled back
+	models = {backend : setup(backend) for backend in ['dict', 'partition']}
+	for model in models.values():
+		agent = model.agent_names[0]
+		state = model.true_state
+		other = next(st for st in model.get_reachable_states(state, agent) if st != state)
+		not_other = model.live_set() & ~(1 << other)
+		before = (rows(model), model.knows_set(agent, not_other))
+		with model.hypothetical():
+			model.relations.remove_relations(agent, state, other)
+			model.changed()
+			assert other not in model.get_reachable_states(state, agent)
+			assert set(model.get_reachable_states(state, agent)) == set(Bitset_View(before[0][agent][state])) - {other}
+			assert model.knows_set(agent, not_other) >> state & 1
+			changed = {key : value for (key, value) in rows(model)[agent].items() if value != before[0][agent][key]}
+			assert list(changed) == [state]
+			if model is models['dict']:
+				expected = (rows(model), model.knows_set(agent, not_other))
+			assert (rows(model), model.knows_set(agent, not_other)) == expected
+		assert (rows(model), model.knows_set(agent, not_other)) == before
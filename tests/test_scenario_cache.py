@@ -0,0 +1,40 @@
+from central_system import *
+from configs import CONFIGS
+
+import os
+import pytest
+import random
+import scenario_cache
+
+
+def run(config, seed):
+	# Run the example from the seed, and return what it did, the next random number and the phases it went through
+	random.seed(seed)
+	system = Central_System(config, 0)
+	system.run_example()
+	goals = {name : agent.eval_goal() for (name, agent) in system.agents.items()}
+	return (system.model.true_state, system.performed_actions, goals, random.random()), set(system.phase_times)
+
+@pytest.mark.parametrize('title', ['language', 'social'])
+@pytest.mark.parametrize('options', [{}, {'relations' : 'matrix', 'compact' : True}, {'engine' : 'bdd'}])
+def test_cached_setup_runs_as_a_new_setup(tmp_path, monkeypatch, title, options):
+	# A run that saves the setup and a run that loads it do the same as a run without the cache
+	monkeypatch.setattr(scenario_cache, 'CACHE_DIR', str(tmp_path))
+	config = dict(CONFIGS[title], **options)
+	for seed in range(3):
+		direct, _ = run(config, seed)
+		saved, _ = run(dict(config, cache=True), seed)
+		assert len(os.listdir(str(tmp_path))) == 1
+		loaded, phases = run(dict(config, cache=True), seed)
+		assert 'parse' not in phases and 'beliefs' in phases
+		assert saved == direct
+		assert loaded == direct
+
+def test_changed_example_is_set_up_again(tmp_path, monkeypatch):
+	# Another agent order is another key, so the cached setup of the first is not used for it
+	monkeypatch.setattr(scenario_cache, 'CACHE_DIR', str(tmp_path))
+	config = dict(CONFIGS['social'], cache=True)
+	run(config, 0)
+	names = list(reversed(config['agent_names']))
+	assert run(dict(config, agent_names=names), 0)[0] == run(dict(config, agent_names=names, cache=False), 0)[0]
+	assert len(os.listdir(str(tmp_path))) == 2
@@ -0,0 +1,42 @@
+from service import Scenario_Service
+
+import json
+
+
+def test_evicted_systems_stop_their_workers():
+	# A service that keeps one system stops the workers of the one it drops, and of the last one when it is closed
+	service = Scenario_Service(keep=1)
+	systems = []
+	for relations in ['dict', 'matrix']:
+		answer = json.loads(service.answer(json.dumps({'id' : relations, 'title' : 'language', 'seed' : 0, 'config' : {'workers' : 1, 'relations' : relations}})))
+		assert 'error' not in answer
+		systems.append(list(service.systems.values())[-1])
+	assert len(service.systems) == 1
+	assert systems[0].executor._shutdown_thread
+	assert not systems[1].executor._shutdown_thread
+	service.close()
+	assert service.systems == {}
+	assert systems[1].executor._shutdown_thread
+
+def test_minimized_sessions_reject_queries_on_merged_literals(tmp_path):
+	# Minimize keeps only the literals of the truth, goals, actions and protocols, queries on others are refused
+	path = tmp_path / 'language.txt'
+	path.write_text(open('examples/language.txt').read().replace('  _first\n', '  _rain\n  _first\n', 1))
+	service = Scenario_Service()
+	request = {'title' : 'language', 'path' : str(path), 'seed' : 0, 'config' : {'minimize' : True}}
+	answer = json.loads(service.answer(json.dumps(dict(request, id=1, queries=['(Abe knows _ground)', '(_first & _true)']))))
+	assert 'error' not in answer
+	assert set(answer['queries']) == {'(Abe knows _ground)', '(_first & _true)'}
+	answer = json.loads(service.answer(json.dumps(dict(request, id=2, queries=['(Abe knows _rain)']))))
+	assert answer['id'] == 2 and '_rain' in answer['error']
+	service.close()
+
+def test_closing_waits_for_the_workers():
+	# Closing the service waits until the worker processes have ended
+	service = Scenario_Service()
+	service.answer(json.dumps({'title' : 'social', 'seed' : 0, 'config' : {'workers' : 1}}))
+	executor = list(service.systems.values())[0].executor
+	processes = list(executor._processes.values())
+	assert processes
+	service.close()
+	assert not any(process.is_alive() for process in processes)